@@ -0,0 +1,156 @@
+"""
+Shared request preparation for the /api/chat and /api/chat/stream endpoints.
+"""
+
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
+
+from google.genai import types
+
+try:
+    # SIMD-accelerated decoder; validate=True is its fast path
+    import pybase64
+
+    def _b64decode(data) -> bytes:
+        return pybase64.b64decode(data, validate=True)
+except ImportError:
+    from binascii import a2b_base64 as _b64decode
+
+logger = logging.getLogger(__name__)
+
+
+# Largest base64 image payload accepted (~6 MB once decoded), checked before decoding
+MAX_IMG_B64 = 8 * 1024 * 1024
+
+def image_too_large(photo_data_uri: Optional[bytes]) -> bool:
+    if not photo_data_uri:
+        return False
+    return len(photo_data_uri) - photo_data_uri.find(b',') - 1 > MAX_IMG_B64
+
+
+# Decoded image parts keyed by the SHA-256 of the data URI: users often resend the
+# same photo while iterating, so repeated turns skip the base64 decode and Blob copy.
+# Bounded by total decoded bytes, since a single photo can be several MB.
+IMAGE_PART_CACHE_BYTES = 64 * 1024 * 1024
+_image_part_cache: "OrderedDict[bytes, types.Part]" = OrderedDict()
+_image_part_cache_bytes = 0
+
+def _digest(photo_data_uri: bytes) -> bytes:
+    return hashlib.sha256(photo_data_uri).digest()
+
+def decode_image_part(photo_data_uri: bytes) -> types.Part:
+    # Decode straight from a view of the URI: no intermediate copy of the
+    # (multi-MB) base64 payload
+    comma = photo_data_uri.index(b',')
+    mime_type = photo_data_uri[len(b"data:"):comma].split(b';', 1)[0].decode() or "image/jpeg"
+    return types.Part(
+        inline_data=types.Blob(
+            mime_type=mime_type,
+            data=_b64decode(memoryview(photo_data_uri)[comma + 1:])
+        )
+    )
+
+async def get_image_part(photo_data_uri: bytes) -> types.Part:
+    # Hashing and decoding a multi-MB photo run in worker threads (both release
+    # the GIL) so the event loop keeps serving other requests meanwhile
+    global _image_part_cache_bytes
+    key = await asyncio.to_thread(_digest, photo_data_uri)
+    part = _image_part_cache.get(key)
+    if part is not None:
+        _image_part_cache.move_to_end(key)
+        return part
+
+    part = await asyncio.to_thread(decode_image_part, photo_data_uri)
+
+    if key not in _image_part_cache:
+        _image_part_cache[key] = part
+        _image_part_cache_bytes += len(part.inline_data.data)
+        while _image_part_cache_bytes > IMAGE_PART_CACHE_BYTES:
+            _, evicted = _image_part_cache.popitem(last=False)
+            _image_part_cache_bytes -= len(evicted.inline_data.data)
+    return part
+
+
+async def extract_image_part(photo_data_uri: Optional[bytes], session_id: str) -> Optional[types.Part]:
+    if not photo_data_uri or not photo_data_uri.startswith(b'data:image/'):
+        return None
+    try:
+        part = await get_image_part(photo_data_uri)
+        logger.info("Added image to message for session %s", session_id)
+        return part
+    except Exception:
+        logger.exception("Error processing image for session %s", session_id, extra={"session_id": session_id})
+        return None
+
+
+def history_key(history: list) -> tuple:
+    # Hashable (role, text) view of the client-provided history (HistoryMessage models)
+    key = []
+    for history_msg in history:
+        role = history_msg.role
+        if role not in ('user', 'assistant'):
+            continue
+        text_content = " ".join(
+            content_part.text for content_part in history_msg.content
+            if content_part.type == 'text' and content_part.text
+        ).strip()
+        if text_content:
+            key.append((role, text_content))
+    return tuple(key)
+
+@lru_cache(maxsize=1024)
+def render_history(key: tuple) -> str:
+    return "\n".join(
+        f"{'User' if role == 'user' else 'Assistant'}: {text}" for role, text in key
+    )
+
+
+def build_context_enhanced_input(user_input: str, history: Optional[list], session_id: str) -> str:
+    """
+    Prefix the user's message with the conversation history sent by the client.
+    """
+    if not history:
+        return user_input
+
+    logger.info("Including %s history messages for session %s", len(history), session_id)
+
+    # Build conversation context (rendered text is memoized per history)
+    conversation_context = render_history(history_key(history))
+    if not conversation_context:
+        logger.info("No conversation history provided for session %s", session_id)
+        logger.debug("Using original input: %s", user_input)
+        return user_input
+
+    context_enhanced_input = f"""CONVERSATION HISTORY:
+{conversation_context}
+
+CURRENT MESSAGE: {user_input}"""
+
+    # Debug logging (skipped entirely at INFO: the enhanced input can be several KB)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Enhanced context for session %s:", session_id)
+        logger.debug("Original input: %s", user_input)
+        logger.debug("Enhanced input: %s", context_enhanced_input)
+    return context_enhanced_input
+
+
+async def build_user_content(
+        user_input: str,
+        history: Optional[list],
+        photo_data_uri: Optional[bytes],
+        session_id: str,
+) -> types.Content:
+    """
+    Build the ADK message for one chat turn: history-enhanced text plus the optional image.
+    """
+    parts = [types.Part(text=build_context_enhanced_input(user_input, history, session_id))]
+    # Most turns are text-only follow-ups: skip the image coroutine entirely
+    if photo_data_uri is not None:
+        image_part = await extract_image_part(photo_data_uri, session_id)
+        if image_part is not None:
+            parts.append(image_part)
+    return types.Content(role='user', parts=parts)
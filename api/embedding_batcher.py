@@ -0,0 +1,73 @@
+"""
+ItemRadar — micro-batching for description embeddings
+──────────────────────────────────────────────────────
+Concurrent found-item reports each need one embedding. Instead of one Vertex AI
+round trip per report, requests arriving within a short window are coalesced
+into a single get_embeddings call of up to `max_batch` texts.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Callable, List, Optional, Tuple
+
+EmbedMany = Callable[[List[str]], List[Optional[List[float]]]]
+
+
+class EmbeddingBatcher:
+    """Coalesces embedding requests made within `flush_delay` seconds into one call."""
+
+    def __init__(self, embed_many: EmbedMany, *, max_batch: int = 32, flush_delay: float = 0.02):
+        self.embed_many = embed_many
+        self.max_batch = max_batch
+        self.flush_delay = flush_delay
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+
+    def submit(self, text: str) -> asyncio.Future:
+        """Queue one text; the returned future resolves to its vector (or None)."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.flush_delay, self._flush)
+        return future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            # Keep a reference so the task isn't garbage collected mid-flight
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        try:
+            # The model client is blocking: run it in the default thread pool
+            vectors = await asyncio.to_thread(self.embed_many, [text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        if len(vectors) != len(batch):
+            # Can't tell which vector belongs to which text: fail the whole batch
+            # rather than leave some callers waiting forever
+            error = RuntimeError(f"embed_many returned {len(vectors)} vectors for {len(batch)} texts")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
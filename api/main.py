@@ -1,43 +1,95 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Response, Request
+from fastapi import FastAPI, HTTPException, UploadFile, File, Response, Request, Depends
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
-from typing import List, Optional
-import sys
+from fastapi.responses import StreamingResponse, ORJSONResponse
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+from typing import List, Optional, Tuple
 import os
-import json
+import orjson
 import asyncio
-from pathlib import Path
 import argparse
-import base64
 import io
 import logging
-import uuid
+import secrets
+import hashlib
+import time
+import queue
+import atexit
+from logging.handlers import QueueHandler, QueueListener
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from collections import OrderedDict
 
 # Configura logging básico
+# Records are queued and written by a background listener thread, so request
+# handlers never block on file/console I/O.
+_log_queue = queue.SimpleQueue()
+_log_listener = QueueListener(
+    _log_queue,
+    logging.FileHandler("activity.log"),
+    logging.StreamHandler(),
+    respect_handler_level=True
+)
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("activity.log"),
-        logging.StreamHandler()
-    ]
+    handlers=[QueueHandler(_log_queue)]
 )
+_log_listener.start()
+_log_listener_stopped = False
 
-logger = logging.getLogger(__name__)
+def stop_log_listener() -> None:
+    # Flush queued records; safe to call twice (lifespan shutdown, then atexit)
+    global _log_listener_stopped
+    if not _log_listener_stopped:
+        _log_listener_stopped = True
+        _log_listener.stop()
 
-# Add the project root to Python path
-project_root = Path(__file__).parent.parent
-sys.path.append(str(project_root))
+atexit.register(stop_log_listener)
+
+logger = logging.getLogger(__name__)
 
 # Import multiagent modules
-from multiAgent.chatbot_manager.agent import root_agent as chatbot_manager
-from multiAgent.lens_agent.agent import lens_agent
+from multiAgent.chatbot_manager.agent import root_agent as chatbot_manager, initiate_search
+from multiAgent.lens_agent import agent as lens_agent
 from google.adk.runners import Runner
+from google.adk.agents.run_config import RunConfig, StreamingMode
 from google.adk.sessions import InMemorySessionService
-from google.genai import types
-
-app = FastAPI(title="ItemRadar API", version="1.0.0")
+from api.session_store import RedisSessionService
+from api.embedding_batcher import EmbeddingBatcher
+from api._chat_common import MAX_IMG_B64, build_user_content, image_too_large
+
+# Blocking agent tools (geocoding, Firestore, Gemini) are awaited through
+# asyncio.to_thread, so this pool bounds how many of them run at once.
+AGENT_THREADS = int(os.getenv("AGENT_THREADS", "64"))
+
+# Backpressure for agent runs: past this many in-flight runs per worker, new chat
+# requests wait on app.state.agent_sema instead of piling more work onto the tool
+# thread pool.
+AGENT_CONCURRENCY = int(os.getenv("AGENT_CONCURRENCY", "16"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=AGENT_THREADS, thread_name_prefix="agent-tool")
+    )
+    # Created here, not at import: on Python 3.9 asyncio primitives bind to the loop
+    # that is current when they are built, which isn't uvicorn's serving loop
+    app.state.agent_sema = asyncio.Semaphore(AGENT_CONCURRENCY)
+    # Warm the found-item clients in the background: startup isn't delayed, and the
+    # first registration usually finds them ready
+    warm_up = asyncio.create_task(asyncio.to_thread(lens_agent.warm_up))
+    yield
+    warm_up.cancel()
+    stop_log_listener()
+
+app = FastAPI(
+    title="ItemRadar API",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
+)
 
 # CORS
 app.add_middleware(
@@ -49,29 +101,83 @@ app.add_middleware(
 )
 
 # Session & Runner
-session_service = InMemorySessionService()
+# With REDIS_URL set, sessions live in Redis so several workers/nodes can share them.
+# Without it we fall back to the in-process store (single worker only).
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    session_service = RedisSessionService.from_url(
+        REDIS_URL,
+        max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "64"))
+    )
+else:
+    session_service = InMemorySessionService()
 APP_NAME = "itemradar_api"
 
+# Send the session cookie only over HTTPS in deployed environments
+SESSION_COOKIE_SECURE = os.getenv("SESSION_COOKIE_SECURE", "false").lower() == "true"
+
+SESSION_COOKIE_KW = dict(
+    httponly=True,
+    max_age=7 * 24 * 60 * 60,
+    secure=SESSION_COOKIE_SECURE,
+    samesite="Lax",
+    path="/"
+)
+# Active clients get the cookie re-sent once it is this close to expiring; the
+# issue time rides along in a second cookie since browsers don't send max_age back
+SESSION_COOKIE_REFRESH = 24 * 60 * 60
+
 manager_runner = Runner(
     agent=chatbot_manager,
     app_name=APP_NAME,
     session_service=session_service
 )
 
+# Token-level streaming for /api/chat/stream: the LLM response is yielded as it
+# is generated instead of after the whole completion.
+STREAM_RUN_CONFIG = RunConfig(streaming_mode=StreamingMode.SSE)
+
 # Modelos
+class ContentPart(BaseModel):
+    model_config = ConfigDict(extra='ignore')
+
+    type: str  # 'text' | 'imageUrl'
+    text: Optional[str] = None
+
+class HistoryMessage(BaseModel):
+    model_config = ConfigDict(extra='ignore')
+
+    role: str  # 'user' | 'assistant' | 'system'
+    content: List[ContentPart] = []
+
 class ChatRequest(BaseModel):
+    model_config = ConfigDict(extra='ignore', str_max_length=8_000_000)
+
     user_input: str
     item_type: str
-    photo_data_uri: Optional[str] = None
-    history: Optional[List[dict]] = []
+    # Hard transport ceiling; images over MAX_IMG_B64 get a regular error response
+    photo_data_uri: Optional[bytes] = Field(default=None, max_length=2 * MAX_IMG_B64)
+    history: Optional[List[HistoryMessage]] = []
     session_id: Optional[str] = None
 
+async def parse_chat_request(req: Request) -> ChatRequest:
+    # Validated straight from the raw body: letting FastAPI bind the model would
+    # decode the whole payload (image included) into Python objects first
+    try:
+        return ChatRequest.model_validate_json(await req.body())
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
+
 class ChatResponse(BaseModel):
+    model_config = ConfigDict(extra='ignore')
+
     success: bool
     response: str
     error: Optional[str] = None
 
 class LostItemRequest(BaseModel):
+    model_config = ConfigDict(extra='ignore')
+
     itemName: str
     description: str
     lastSeenLocation: str
@@ -80,6 +186,8 @@ class LostItemRequest(BaseModel):
     session_id: Optional[str] = None  # Añadido
 
 class FoundItemRequest(BaseModel):
+    model_config = ConfigDict(extra='ignore')
+
     itemName: str
     description: str
     foundLocation: str
@@ -89,277 +197,246 @@ class FoundItemRequest(BaseModel):
     session_id: Optional[str] = None  # Añadido
 
 class LostItemResponse(BaseModel):
+    model_config = ConfigDict(extra='ignore')
+
     success: bool
     message: str
     search_id: Optional[str] = None
     matches: Optional[List[dict]] = []
 
 class FoundItemResponse(BaseModel):
+    model_config = ConfigDict(extra='ignore')
+
     success: bool
     message: str
     item_id: Optional[str] = None
 
-def get_or_create_session_id(req: Request, response: Response, provided_session_id: Optional[str]) -> str:
+def set_session_cookie(response: Response, session_id: str) -> None:
+    response.set_cookie(key="session_id", value=session_id, **SESSION_COOKIE_KW)
+    response.set_cookie(key="session_issued", value=str(int(time.time())), **SESSION_COOKIE_KW)
+
+def session_cookie_expiring(req: Request) -> bool:
+    try:
+        issued = int(req.cookies.get("session_issued", ""))
+    except ValueError:
+        return True
+    return time.time() - issued > SESSION_COOKIE_KW["max_age"] - SESSION_COOKIE_REFRESH
+
+def get_or_create_session_id(req: Request, response: Response, provided_session_id: Optional[str]) -> Tuple[str, str]:
+    # Returns (session_id, user_id); the user id is the part before the first "_"
     # Check if cookie or parameter session exists
-    session_id = provided_session_id or req.cookies.get("session_id")
+    cookie_session_id = req.cookies.get("session_id")
+    session_id = provided_session_id or cookie_session_id
 
     if session_id:
-        # Set it again just in case the client didn't persist it
-        response.set_cookie(
-            key="session_id",
-            value=session_id,
-            httponly=True,
-            max_age=7 * 24 * 60 * 60,
-            secure=False,
-            samesite="Lax",
-            path="/"
-        )
-        user_id = session_id.split("_")[0]
-        logger.info(f"Re-setting existing session: {session_id} | user_id: {user_id}")
-        return session_id
+        # Only send Set-Cookie when the client doesn't already hold this id,
+        # or when its cookie is about to expire
+        if session_id != cookie_session_id or session_cookie_expiring(req):
+            set_session_cookie(response, session_id)
+        user_id = session_id.split("_", 1)[0]
+        logger.debug("Using existing session: %s | user_id: %s", session_id, user_id)
+        return session_id, user_id
 
     # Create a new session
-    new_session_id = f"{uuid.uuid4().hex}_session"
-    user_id = new_session_id.split("_")[0]
-
-    response.set_cookie(
-        key="session_id",
-        value=new_session_id,
-        httponly=True,
-        max_age=7 * 24 * 60 * 60,
-        secure=False,
-        samesite="Lax",
-        path="/"
-    )
-    logger.info(f"Created new session: {new_session_id} | user_id: {user_id}")
-    return new_session_id
+    user_id = secrets.token_hex(16)
+    new_session_id = f"{user_id}_session"
+
+    set_session_cookie(response, new_session_id)
+    logger.info("Created new session: %s | user_id: %s", new_session_id, user_id)
+    return new_session_id, user_id
+
+async def ensure_session(user_id: str, session_id: str) -> None:
+    # Reuse the stored session so the agent keeps its state across turns;
+    # only create it the first time we see this session_id.
+    if isinstance(session_service, RedisSessionService):
+        # Single SET NX instead of loading the whole event list just to check
+        created = await session_service.create_session_if_missing(
+            app_name=APP_NAME, user_id=user_id, session_id=session_id
+        )
+    else:
+        session = await session_service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+        created = session is None
+        if created:
+            await session_service.create_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+
+    if created:
+        logger.info("Session created: %s", session_id)
+    else:
+        logger.info("Session retrieved: %s", session_id)
+
+
+# Read-only responses carry an ETag so browsers/proxies can revalidate them
+# with a conditional GET and get an empty 304 instead of the full body
+CACHE_MAX_AGE = int(os.getenv("CACHE_MAX_AGE", "30"))
+
+def _etag(payload: dict) -> str:
+    return '"' + hashlib.blake2b(orjson.dumps(payload), digest_size=12).hexdigest() + '"'
+
+def not_modified(req: Request, response: Response, payload: dict, cache_control: str) -> Optional[Response]:
+    etag = _etag(payload)
+    response.headers["Cache-Control"] = cache_control
+    response.headers["ETag"] = etag
+    if req.headers.get("if-none-match") != etag:
+        return None
+
+    not_modified_response = Response(status_code=304, headers={"Cache-Control": cache_control, "ETag": etag})
+    # Keep the session cookie set on the injected response, if any
+    not_modified_response.raw_headers.extend(h for h in response.raw_headers if h[0] == b"set-cookie")
+    return not_modified_response
 
 
+ROOT_PAYLOAD = {"message": "ItemRadar API is running"}
+
 @app.get("/")
-async def root():
-    return {"message": "ItemRadar API is running"}
+async def root(*, response: Response, req: Request):
+    return not_modified(req, response, ROOT_PAYLOAD, f"public, max-age={CACHE_MAX_AGE}") or ROOT_PAYLOAD
 
 @app.post("/api/chat", response_model=ChatResponse)
-async def chat_with_agent(request: ChatRequest, *, response: Response, req: Request):
+async def chat_with_agent(request: ChatRequest = Depends(parse_chat_request), *, response: Response, req: Request):
+    session_id = None
     try:
-        session_id = get_or_create_session_id(req, response, request.session_id)
-        user_id = session_id.split("_")[0]
+        session_id, user_id = get_or_create_session_id(req, response, request.session_id)
 
-        logger.info(f"Processing chat request for session {session_id}, user {user_id}")
+        logger.info("Processing chat request for session %s, user %s", session_id, user_id)
 
-        try:
-            await session_service.create_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
-            logger.info(f"Session created/retrieved: {session_id}")
-        except Exception as e:
-            logger.warning(f"Session creation warning: {e}")
-
-        # Build context-aware user input that includes conversation history
-        context_enhanced_input = request.user_input
-        
-        # If history is provided, include it in the context
-        if request.history and len(request.history) > 0:
-            logger.info(f"Including {len(request.history)} history messages for session {session_id}")
-            
-            # Build conversation context
-            conversation_context = []
-            for history_msg in request.history:
-                if history_msg.get('role') in ['user', 'assistant']:
-                    # Extract text content from history message
-                    text_content = ""
-                    if 'content' in history_msg:
-                        for content_part in history_msg['content']:
-                            if content_part.get('type') == 'text' and content_part.get('text'):
-                                text_content += content_part['text'] + " "
-                    
-                    if text_content.strip():
-                        role_label = "User" if history_msg['role'] == 'user' else "Assistant"
-                        conversation_context.append(f"{role_label}: {text_content.strip()}")
-            
-            # Add conversation context to the user input
-            if conversation_context:
-                context_enhanced_input = f"""CONVERSATION HISTORY:
-{chr(10).join(conversation_context)}
-
-CURRENT MESSAGE: {request.user_input}"""
-                
-                # Debug logging
-                logger.info(f"Enhanced context for session {session_id}:")
-                logger.info(f"Original input: {request.user_input}")
-                logger.info(f"Enhanced input: {context_enhanced_input}")
-            else:
-                logger.info(f"No conversation history provided for session {session_id}")
-                logger.info(f"Using original input: {request.user_input}")
+        if image_too_large(request.photo_data_uri):
+            logger.warning("Rejected oversized image for session %s", session_id)
+            return ChatResponse(success=False, response="", error="Image too large")
 
-        # Process current message
-        parts = [types.Part(text=context_enhanced_input)]
-        if request.photo_data_uri and request.photo_data_uri.startswith('data:image/'):
-            try:
-                image_data = request.photo_data_uri.split(',', 1)[1]
-                parts.append(types.Part(
-                    inline_data=types.Blob(
-                        mime_type="image/jpeg",
-                        data=image_data
-                    )
-                ))
-                logger.info(f"Added image to message for session {session_id}")
-            except Exception as e:
-                logger.error(f"Error processing image: {e}")
-
-        user_content = types.Content(role='user', parts=parts)
+        await ensure_session(user_id, session_id)
+
+        user_content = await build_user_content(request.user_input, request.history, request.photo_data_uri, session_id)
         final_response = ""
-        response_received = False
 
-        logger.info(f"Running agent for session {session_id} with enhanced context")
+        logger.info("Running agent for session %s with enhanced context", session_id)
 
         # Run the agent with the current message
         # The Google ADK session service automatically maintains conversation history
         # based on the session_id, so each call will have access to previous messages
-        async for event in manager_runner.run_async(user_id=user_id, session_id=session_id, new_message=user_content):
-            if event.is_final_response() and event.content and event.content.parts:
-                final_response = " ".join([
-                    part.text for part in event.content.parts if hasattr(part, 'text') and part.text
-                ])
-                response_received = True
+        async with app.state.agent_sema:
+            async for event in manager_runner.run_async(user_id=user_id, session_id=session_id, new_message=user_content):
+                # Intermediate events (tool calls, sub-agent hops) carry nothing to return
+                content = event.content
+                if content is None or not content.parts or not event.is_final_response():
+                    continue
+
+                texts = []
+                for part in content.parts:
+                    text = getattr(part, 'text', None)
+                    if text:
+                        texts.append(text)
+                final_response = " ".join(texts)
                 break
 
-        if not response_received or not final_response.strip():
-            logger.error(f"No valid response received for session {session_id}")
+        if not final_response.strip():
+            logger.error("No valid response received for session %s", session_id)
             return ChatResponse(success=False, response="", error="No valid response received from agent")
 
-        logger.info(f"Agent response received for session {session_id}: {final_response[:100]}...")
+        logger.info("Agent response received for session %s: %s...", session_id, final_response[:100])
         return ChatResponse(success=True, response=final_response.strip())
 
     except Exception as e:
-        logger.error(f"Error in chat endpoint: {e}")
+        logger.exception("Error in chat endpoint for session %s", session_id, extra={"session_id": session_id})
         return ChatResponse(success=False, response="", error=f"Internal server error: {str(e)}")
 
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Headers": "*",
+}
+
+def _sse(payload: dict) -> bytes:
+    # Frame one server-sent event directly as bytes
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+# Static frames are encoded once instead of per request
+THINKING_FRAME = _sse({'type': 'thinking', 'message': 'Assistant is thinking...'})
+IMAGE_TOO_LARGE_FRAME = _sse({'type': 'error', 'message': 'Image too large'})
+NO_RESPONSE_FRAME = _sse({'type': 'error', 'message': 'No valid response received from agent'})
+
 @app.post("/api/chat/stream")
-async def chat_with_agent_stream(request: ChatRequest, *, response: Response, req: Request):
+async def chat_with_agent_stream(request: ChatRequest = Depends(parse_chat_request), *, response: Response, req: Request):
     """
     Streaming chat endpoint that sends real-time updates as the agent processes the request.
     """
+    # Resolved before streaming starts: headers set on the injected response
+    # later on would never reach the client
+    session_id, user_id = get_or_create_session_id(req, response, request.session_id)
+
     async def generate_stream():
         try:
-            session_id = get_or_create_session_id(req, response, request.session_id)
-            user_id = session_id.split("_")[0]
+            logger.info("Processing streaming chat request for session %s, user %s", session_id, user_id)
 
-            logger.info(f"Processing streaming chat request for session {session_id}, user {user_id}")
+            if image_too_large(request.photo_data_uri):
+                logger.warning("Rejected oversized image for session %s", session_id)
+                yield IMAGE_TOO_LARGE_FRAME
+                return
 
-            try:
-                await session_service.create_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
-                logger.info(f"Session created/retrieved: {session_id}")
-            except Exception as e:
-                logger.warning(f"Session creation warning: {e}")
-
-            # Build context-aware user input that includes conversation history
-            context_enhanced_input = request.user_input
-            
-            # If history is provided, include it in the context
-            if request.history and len(request.history) > 0:
-                logger.info(f"Including {len(request.history)} history messages for session {session_id}")
-                
-                # Build conversation context
-                conversation_context = []
-                for history_msg in request.history:
-                    if history_msg.get('role') in ['user', 'assistant']:
-                        # Extract text content from history message
-                        text_content = ""
-                        if 'content' in history_msg:
-                            for content_part in history_msg['content']:
-                                if content_part.get('type') == 'text' and content_part.get('text'):
-                                    text_content += content_part['text'] + " "
-                        
-                        if text_content.strip():
-                            role_label = "User" if history_msg['role'] == 'user' else "Assistant"
-                            conversation_context.append(f"{role_label}: {text_content.strip()}")
-                
-                # Add conversation context to the user input
-                if conversation_context:
-                    context_enhanced_input = f"""CONVERSATION HISTORY:
-{chr(10).join(conversation_context)}
-
-CURRENT MESSAGE: {request.user_input}"""
-                    
-                    # Debug logging
-                    logger.info(f"Enhanced context for session {session_id}:")
-                    logger.info(f"Original input: {request.user_input}")
-                    logger.info(f"Enhanced input: {context_enhanced_input}")
-                else:
-                    logger.info(f"No conversation history provided for session {session_id}")
-                    logger.info(f"Using original input: {request.user_input}")
-
-            # Process current message
-            parts = [types.Part(text=context_enhanced_input)]
-            if request.photo_data_uri and request.photo_data_uri.startswith('data:image/'):
-                try:
-                    image_data = request.photo_data_uri.split(',', 1)[1]
-                    parts.append(types.Part(
-                        inline_data=types.Blob(
-                            mime_type="image/jpeg",
-                            data=image_data
-                        )
-                    ))
-                    logger.info(f"Added image to message for session {session_id}")
-                except Exception as e:
-                    logger.error(f"Error processing image: {e}")
-
-            user_content = types.Content(role='user', parts=parts)
-
-            logger.info(f"Running streaming agent for session {session_id} with enhanced context")
+            await ensure_session(user_id, session_id)
+
+            user_content = await build_user_content(request.user_input, request.history, request.photo_data_uri, session_id)
+
+            logger.info("Running streaming agent for session %s with enhanced context", session_id)
 
             # Send initial "thinking" message
-            yield f"data: {json.dumps({'type': 'thinking', 'message': 'Assistant is thinking...'})}\n\n"
+            yield THINKING_FRAME
 
-            # Run the agent and stream responses
+            # Run the agent and stream responses. With SSE streaming the model's
+            # text arrives as partial events (deltas), followed by one aggregated
+            # event repeating the whole text, which must not be sent twice.
             response_text = ""
-            response_received = False
-
-            async for event in manager_runner.run_async(user_id=user_id, session_id=session_id, new_message=user_content):
-                if event.is_final_response() and event.content and event.content.parts:
-                    # Stream the final response
-                    for part in event.content.parts:
-                        if hasattr(part, 'text') and part.text:
-                            response_text += part.text
-                            # Send partial response
-                            yield f"data: {json.dumps({'type': 'partial', 'message': part.text})}\n\n"
-                    
-                    response_received = True
-                    break
-                elif event.content and event.content.parts:
-                    # Stream intermediate responses
-                    for part in event.content.parts:
-                        if hasattr(part, 'text') and part.text:
-                            response_text += part.text
-                            yield f"data: {json.dumps({'type': 'partial', 'message': part.text})}\n\n"
-
-            if not response_received or not response_text.strip():
-                logger.error(f"No valid response received for session {session_id}")
-                yield f"data: {json.dumps({'type': 'error', 'message': 'No valid response received from agent'})}\n\n"
+            streamed_text = ""
+
+            async with app.state.agent_sema:
+                async for event in manager_runner.run_async(
+                        user_id=user_id,
+                        session_id=session_id,
+                        new_message=user_content,
+                        run_config=STREAM_RUN_CONFIG
+                ):
+                    content = event.content
+                    if content is not None and content.parts:
+                        text = "".join(getattr(part, 'text', None) or "" for part in content.parts)
+                        if event.partial:
+                            if text:
+                                streamed_text += text
+                                # Send partial response
+                                yield _sse({'type': 'partial', 'message': text})
+                            continue
+                        if text:
+                            if not streamed_text:
+                                # Model didn't stream this turn, send it as one chunk
+                                yield _sse({'type': 'partial', 'message': text})
+                            response_text += text
+                        streamed_text = ""
+
+                    if event.is_final_response():
+                        break
+
+            if not response_text.strip():
+                logger.error("No valid response received for session %s", session_id)
+                yield NO_RESPONSE_FRAME
             else:
-                logger.info(f"Streaming agent response completed for session {session_id}: {response_text[:100]}...")
+                logger.info("Streaming agent response completed for session %s: %s...", session_id, response_text[:100])
                 # Send completion signal
-                yield f"data: {json.dumps({'type': 'complete', 'message': response_text.strip()})}\n\n"
+                yield _sse({'type': 'complete', 'message': response_text.strip()})
 
         except Exception as e:
-            logger.error(f"Error in streaming chat endpoint: {e}")
-            yield f"data: {json.dumps({'type': 'error', 'message': f'Internal server error: {str(e)}'})}\n\n"
-
-    return StreamingResponse(
-        generate_stream(),
-        media_type="text/plain",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Headers": "*",
-        }
-    )
+            logger.exception(
+                "Error in streaming chat endpoint for session %s", session_id, extra={"session_id": session_id}
+            )
+            yield _sse({'type': 'error', 'message': f'Internal server error: {str(e)}'})
+
+    stream_response = StreamingResponse(generate_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+    # FastAPI doesn't merge the injected response into a returned Response
+    stream_response.raw_headers.extend(h for h in response.raw_headers if h[0] == b"set-cookie")
+    return stream_response
 
 @app.post("/api/lost-item", response_model=LostItemResponse)
 async def report_lost_item(request: LostItemRequest, *, response: Response, req: Request):
     try:
-        session_id = get_or_create_session_id(req, response, request.session_id)
-        user_id = session_id.split("_")[0]
+        session_id, user_id = get_or_create_session_id(req, response, request.session_id)
 
         search_context = {
             "description": request.description,
@@ -384,8 +461,7 @@ async def report_lost_item(request: LostItemRequest, *, response: Response, req:
 @app.post("/api/found-item", response_model=FoundItemResponse)
 async def report_found_item(request: FoundItemRequest, *, response: Response, req: Request):
     try:
-        session_id = get_or_create_session_id(req, response, request.session_id)
-        user_id = session_id.split("_")[0]
+        session_id, user_id = get_or_create_session_id(req, response, request.session_id)
 
         result = await process_found_item(request)
 
@@ -401,41 +477,46 @@ async def report_found_item(request: FoundItemRequest, *, response: Response, re
 @app.get("/api/search-status/{search_id}")
 async def get_search_status(search_id: str, *, response: Response, req: Request):
     try:
-        session_id = get_or_create_session_id(req, response, None)
-        user_id = session_id.split("_")[0]
+        session_id, user_id = get_or_create_session_id(req, response, None)
 
-        return {
+        status = {
             "search_id": search_id,
             "status": "active",
             "matches_found": 0,
             "last_updated": "2024-01-01T00:00:00Z"
         }
+        # private: the response carries the caller's session cookie
+        return not_modified(req, response, status, f"private, max-age={CACHE_MAX_AGE}") or status
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving search status: {str(e)}")
 
+@dataclass
+class SearchToolContext:
+    # Minimal stand-in for ADK's ToolContext when calling agent tools directly.
+    # Explicit __slots__ (dataclass(slots=True) needs Python 3.10+)
+    __slots__ = ("state",)
+    state: dict
+
 async def initiate_lost_item_search(search_context: dict) -> dict:
     try:
-        tool_context = type('ToolContext', (), {
-            'state': {
-                'search_params': {
-                    'description': search_context['description'],
-                    'location': search_context['location']
-                },
-                'has_search_params': True,
-                'contact_info': search_context['contact_info'],
-                'item_name': search_context['item_name']
-            }
-        })()
-
-        from multiAgent.chatbot_manager.agent import initiate_search
-        search_result = initiate_search(
-            search_context['description'],
-            search_context['location'],
-            tool_context
-        )
-
-        search_id = f"search_{len(search_context['description'])}"
+        # Random per report: two people describing the same item at the same
+        # place still get separate searches
+        search_id = f"search_{secrets.token_hex(16)}"
+
+        tool_context = SearchToolContext(state={
+            'search_params': {
+                'description': search_context['description'],
+                'location': search_context['location']
+            },
+            'has_search_params': True,
+            'contact_info': search_context['contact_info'],
+            'item_name': search_context['item_name']
+        })
+
+        # Only records the search parameters in the state dict: no I/O, so it is
+        # cheaper to call inline than to hop to a worker thread
+        initiate_search(search_context['description'], search_context['location'], tool_context)
 
         return {
             "search_id": search_id,
@@ -443,22 +524,71 @@ async def initiate_lost_item_search(search_context: dict) -> dict:
             "initial_matches": []
         }
 
-    except Exception as e:
-        print(f"Error in lost item search: {e}")
+    except Exception:
+        logger.exception("Error in lost item search")
         raise
 
+# Geocoding results for repeated location strings (campus buildings, stations...).
+# Shared through Redis when it is configured, otherwise kept per worker.
+GEOCODE_CACHE_TTL = 24 * 60 * 60
+GEOCODE_CACHE_SIZE = 1024
+_geocode_cache: "OrderedDict[str, tuple]" = OrderedDict()
+
+async def cached_geocode(location: str) -> dict:
+    key = "itemradar:geo:" + hashlib.blake2b(location.strip().lower().encode(), digest_size=16).hexdigest()
+
+    if REDIS_URL:
+        # The cache is best effort: a Redis hiccup or a bad entry just means
+        # geocoding the location again
+        try:
+            cached = await session_service.redis.get(key)
+            if cached is not None:
+                return orjson.loads(cached)
+        except Exception:
+            logger.warning("Geocode cache read failed for %r", location, exc_info=True)
+    else:
+        entry = _geocode_cache.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            _geocode_cache.move_to_end(key)
+            return entry[1]
+
+    result = await asyncio.to_thread(lens_agent.geocode_location, location)
+
+    # Only successful lookups are cached; failures may be transient
+    if result.get("status") == "success":
+        if REDIS_URL:
+            try:
+                await session_service.redis.set(key, orjson.dumps(result), ex=GEOCODE_CACHE_TTL)
+            except Exception:
+                logger.warning("Geocode cache write failed for %r", location, exc_info=True)
+        else:
+            _geocode_cache[key] = (time.monotonic() + GEOCODE_CACHE_TTL, result)
+            if len(_geocode_cache) > GEOCODE_CACHE_SIZE:
+                _geocode_cache.popitem(last=False)
+    return result
+
+# Found-item descriptions reported at about the same time share one embedding call
+embedding_batcher = EmbeddingBatcher(lens_agent.embed_descriptions)
+
 async def process_found_item(request: FoundItemRequest) -> dict:
     try:
-        geocode_result = lens_agent.geocode_location(request.foundLocation)
+        # Geocoding and embedding the description are independent network calls:
+        # run them side by side instead of back to back
+        geocode_result, feature_vector = await asyncio.gather(
+            cached_geocode(request.foundLocation),
+            embedding_batcher.submit(request.description)
+        )
         if geocode_result.get("status") != "success":
             raise Exception(f"Failed to geocode location: {geocode_result.get('error_message')}")
 
-        registration_result = lens_agent.register_found_item(
+        registration_result = await asyncio.to_thread(
+            lens_agent.save_found_item,
             description=request.description,
             contact_email=request.contactInfo,
             address=geocode_result["address"],
             latitude=geocode_result["latitude"],
-            longitude=geocode_result["longitude"]
+            longitude=geocode_result["longitude"],
+            feature_vector=feature_vector
         )
 
         if registration_result.get("status") != "success":
@@ -469,15 +599,42 @@ async def process_found_item(request: FoundItemRequest) -> dict:
             "status": "registered"
         }
 
-    except Exception as e:
-        print(f"Error in found item processing: {e}")
+    except Exception:
+        logger.exception("Error in found item processing")
         raise
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='ItemRadar API Server')
     parser.add_argument('--port', type=int, default=8000, help='Port to run the server on')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=os.cpu_count() if REDIS_URL else 1,
+        help='Number of worker processes (more than one requires REDIS_URL for shared sessions)'
+    )
+    parser.add_argument(
+        '--backlog',
+        type=int,
+        default=2048,
+        help='Maximum number of pending connections (burst absorption across workers)'
+    )
     args = parser.parse_args()
 
+    if args.workers > 1 and not REDIS_URL:
+        logger.warning("Running several workers without REDIS_URL: chat sessions will not be shared between them")
+
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=args.port)
+    # Several workers need an import string; a single worker reuses the app already built here
+    uvicorn.run(
+        "api.main:app" if args.workers > 1 else app,
+        host="0.0.0.0",
+        port=args.port,
+        workers=args.workers,
+        backlog=args.backlog,
+        # "auto" picks uvloop/httptools (installed by uvicorn[standard]) and
+        # falls back to asyncio/h11 where they aren't available, e.g. on Windows
+        loop="auto",
+        http="auto",
+        log_level="info"
+    )
 
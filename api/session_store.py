@@ -0,0 +1,194 @@
+"""
+ItemRadar — Redis-backed ADK session store
+──────────────────────────────────────────
+Keeps chat sessions outside the API process so any uvicorn worker (or node)
+can serve any turn of a conversation.
+
+Layout per session (all keys share the same TTL, refreshed on every write):
+  {prefix}:sess:{app}:{user}:{session_id}         -> Session JSON without events
+  {prefix}:sess:{app}:{user}:{session_id}:events  -> list of Event JSON (last max_events)
+  {prefix}:idx:{app}:{user}                       -> set of session ids
+
+Inline image bytes are not persisted: every turn reloads the stored events, and
+keeping multi-MB photos there would re-fetch them on each message. The model
+already saw the image on the turn it was sent; later turns get a text marker.
+"""
+
+from __future__ import annotations
+
+import time
+import uuid
+from typing import Any, Optional
+
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+from google.genai import types
+from redis.asyncio import Redis
+
+DEFAULT_SESSION_TTL = 7 * 24 * 60 * 60  # mirrors the session_id cookie max_age
+DEFAULT_MAX_EVENTS = 200
+
+
+def _persisted_event_json(event: Event) -> str:
+    """Serialize an event for storage, replacing inline image bytes with a text marker."""
+    content = event.content
+    if content is None or not content.parts or not any(part.inline_data for part in content.parts):
+        return event.model_dump_json(exclude_none=True)
+
+    parts = [
+        types.Part(text=f"[{part.inline_data.mime_type or 'binary'} attachment omitted]")
+        if part.inline_data else part
+        for part in content.parts
+    ]
+    stored = event.model_copy(update={"content": content.model_copy(update={"parts": parts})})
+    return stored.model_dump_json(exclude_none=True)
+
+
+class RedisSessionService(BaseSessionService):
+    """ADK session service that persists sessions in Redis with TTL expiry."""
+
+    def __init__(
+            self,
+            redis: Redis,
+            *,
+            ttl: int = DEFAULT_SESSION_TTL,
+            max_events: int = DEFAULT_MAX_EVENTS,
+            prefix: str = "itemradar",
+    ):
+        self.redis = redis
+        self.ttl = ttl
+        self.max_events = max_events
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, *, max_connections: int = 64, **kwargs) -> "RedisSessionService":
+        redis = Redis.from_url(url, decode_responses=False, max_connections=max_connections)
+        return cls(redis, **kwargs)
+
+    # ─── keys ───────────────────────────────────────────────────────
+    def _session_key(self, app_name: str, user_id: str, session_id: str) -> str:
+        return f"{self.prefix}:sess:{app_name}:{user_id}:{session_id}"
+
+    def _events_key(self, app_name: str, user_id: str, session_id: str) -> str:
+        return f"{self._session_key(app_name, user_id, session_id)}:events"
+
+    def _index_key(self, app_name: str, user_id: str) -> str:
+        return f"{self.prefix}:idx:{app_name}:{user_id}"
+
+    # ─── BaseSessionService ─────────────────────────────────────────
+    async def create_session(
+            self,
+            *,
+            app_name: str,
+            user_id: str,
+            state: Optional[dict[str, Any]] = None,
+            session_id: Optional[str] = None,
+    ) -> Session:
+        session_id = session_id.strip() if session_id and session_id.strip() else uuid.uuid4().hex
+        session = Session(
+            id=session_id,
+            app_name=app_name,
+            user_id=user_id,
+            state=state or {},
+            last_update_time=time.time(),
+        )
+
+        session_key = self._session_key(app_name, user_id, session_id)
+        events_key = self._events_key(app_name, user_id, session_id)
+        index_key = self._index_key(app_name, user_id)
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(session_key, session.model_dump_json(exclude={"events"}), ex=self.ttl)
+            pipe.delete(events_key)
+            pipe.sadd(index_key, session_id)
+            pipe.expire(index_key, self.ttl)
+            await pipe.execute()
+
+        return session
+
+    async def create_session_if_missing(self, *, app_name: str, user_id: str, session_id: str) -> bool:
+        """
+        Create an empty session unless one already exists (SET NX): one round trip,
+        without loading the stored events. Returns True when it was created.
+        """
+        session = Session(id=session_id, app_name=app_name, user_id=user_id, state={}, last_update_time=time.time())
+        index_key = self._index_key(app_name, user_id)
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(self._session_key(app_name, user_id, session_id), session.model_dump_json(exclude={"events"}),
+                     ex=self.ttl, nx=True)
+            pipe.sadd(index_key, session_id)
+            pipe.expire(index_key, self.ttl)
+            created, _, _ = await pipe.execute()
+
+        return bool(created)
+
+    async def get_session(
+            self,
+            *,
+            app_name: str,
+            user_id: str,
+            session_id: str,
+            config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        session_key = self._session_key(app_name, user_id, session_id)
+        events_key = self._events_key(app_name, user_id, session_id)
+
+        # Only pull the tail of the event list when the caller asks for it
+        start = -config.num_recent_events if config and config.num_recent_events else 0
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.get(session_key)
+            pipe.lrange(events_key, start, -1)
+            raw_session, raw_events = await pipe.execute()
+
+        if raw_session is None:
+            return None
+
+        session = Session.model_validate_json(raw_session)
+        session.events = [Event.model_validate_json(raw) for raw in raw_events]
+
+        if config and config.after_timestamp:
+            session.events = [e for e in session.events if e.timestamp >= config.after_timestamp]
+
+        return session
+
+    async def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        session_ids = await self.redis.smembers(self._index_key(app_name, user_id))
+        if not session_ids:
+            return ListSessionsResponse()
+
+        keys = [self._session_key(app_name, user_id, sid.decode()) for sid in session_ids]
+        sessions = [Session.model_validate_json(raw) for raw in await self.redis.mget(keys) if raw is not None]
+        return ListSessionsResponse(sessions=sessions)
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(
+                self._session_key(app_name, user_id, session_id),
+                self._events_key(app_name, user_id, session_id),
+            )
+            pipe.srem(self._index_key(app_name, user_id), session_id)
+            await pipe.execute()
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        # Partial (streamed) events are never persisted, same as the base class
+        if event.partial:
+            return event
+
+        await super().append_event(session=session, event=event)
+        session.last_update_time = event.timestamp
+
+        session_key = self._session_key(session.app_name, session.user_id, session.id)
+        events_key = self._events_key(session.app_name, session.user_id, session.id)
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(session_key, session.model_dump_json(exclude={"events"}), ex=self.ttl)
+            pipe.rpush(events_key, _persisted_event_json(event))
+            pipe.ltrim(events_key, -self.max_events, -1)
+            pipe.expire(events_key, self.ttl)
+            pipe.expire(self._index_key(session.app_name, session.user_id), self.ttl)
+            await pipe.execute()
+
+        return event
@@ -0,0 +1,36 @@
+import os
+import threading
+import warnings
+
+from dotenv import load_dotenv
+from google.cloud import aiplatform
+import google.generativeai as genai
+
+_initialized = False
+_init_lock = threading.Lock()
+
+
+def init_once() -> None:
+    """
+    Initialize Vertex AI and the Gemini SDK from the environment, once per process
+    however many sub-agents ask for it.
+    """
+    global _initialized
+    if _initialized:
+        return
+
+    with _init_lock:
+        if not _initialized:
+            load_dotenv()
+            aiplatform.init(project=os.getenv("PROJECT_ID"), location=os.getenv("REGION", "us-central1"))
+            api_key = os.getenv("GOOGLE_API_KEY")
+            if not api_key and os.getenv("GEMINI_API_KEY"):
+                # The reducer and filter agents used to read GEMINI_API_KEY
+                warnings.warn(
+                    "GEMINI_API_KEY is deprecated, set GOOGLE_API_KEY instead",
+                    FutureWarning,
+                    stacklevel=2,
+                )
+                api_key = os.getenv("GEMINI_API_KEY")
+            genai.configure(api_key=api_key)
+            _initialized = True
@@ -1,15 +1,12 @@
-import os
 import re
 import json # Import json to help parse the list of dicts
-from dotenv import load_dotenv
 from google.adk.agents import Agent
 from google.adk.tools.tool_context import ToolContext
-from google.generativeai import GenerativeModel, configure as configure_gemini
 
-load_dotenv()
+from ...bootstrap import init_once
 
-# Configure Gemini API
-configure_gemini(api_key=os.getenv("GEMINI_API_KEY"))
+# Loads .env and configures the Gemini API (shared by all sub-agents)
+init_once()
 
 filter_agent = Agent(
     name="filter_agent",
@@ -10,18 +10,25 @@ import datetime as dt
 import os
 import uuid
 import re
-import json
+import orjson
 import requests
+from urllib3.util.retry import Retry
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from collections import OrderedDict
 from typing import Dict, List, Optional
 
 from dotenv import load_dotenv
 from google.adk.agents import Agent
-from google.cloud import aiplatform, firestore
 from vertexai.language_models import TextEmbeddingModel
 
 import google.generativeai as genai
 
+from ...bootstrap import init_once
+from ...tool_utils import run_in_thread
+
 # ─── bootstrap ──────────────────────────────────────────────────
 load_dotenv()
 
@@ -34,24 +41,28 @@ GEOCODING_API_KEY = os.getenv("GEOCODING_API_KEY")  # Google Maps API key (optio
 if not all([PROJECT_ID, REGION, INDEX_ID, GOOGLE_API_KEY]):
     raise RuntimeError("PROJECT_ID, REGION, INDEX_ID, and GOOGLE_API_KEY must be set")
 
-aiplatform.init(project=PROJECT_ID, location=REGION)
-genai.configure(api_key=GOOGLE_API_KEY)
-
-# Updated embedding model - using the latest stable version
-try:
-    # Try the latest text embedding model first
-    _embed = TextEmbeddingModel.from_pretrained("text-embedding-004")
-except Exception:
-    try:
-        # Fallback to gecko-003 if 004 is not available
-        _embed = TextEmbeddingModel.from_pretrained("textembedding-gecko@003")
-    except Exception:
-        try:
-            # Final fallback to gecko-002
-            _embed = TextEmbeddingModel.from_pretrained("textembedding-gecko@002")
-        except Exception as e:
-            print(f"Warning: Could not load any embedding model: {e}")
-            _embed = None
+init_once()
+
+# One keep-alive HTTP session for all geocoding calls: repeated lookups reuse the
+# TLS connection to the geocoder instead of opening a new one per request.
+# Sized for the API's tool thread pool, which calls geocode_location concurrently.
+# Gateway errors (common on the free Nominatim endpoint) get two quick retries on
+# the pooled connection before falling through to the next geocoder. Read timeouts
+# are not retried and Retry-After is ignored, so a call never waits much past its
+# own timeout.
+_http = requests.Session()
+_http.mount("https://", requests.adapters.HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=64,
+    max_retries=Retry(
+        total=2,
+        read=0,
+        status=2,
+        backoff_factor=0.2,
+        status_forcelist=(502, 503, 504),
+        respect_retry_after_header=False,
+    ),
+))
 
 def check_available_models():
     """
@@ -78,6 +89,28 @@ def check_available_models():
 
 # ─── Enhanced location preprocessing ────────────────────────────────────
 
+# Common abbreviations and expansions, compiled once (applied in this order)
+_ABBREVIATIONS = [
+    (re.compile(pattern, re.IGNORECASE), full) for pattern, full in (
+        (r'\bSt\b', 'Street'),
+        (r'\bAve\b', 'Avenue'),
+        (r'\bBlvd\b', 'Boulevard'),
+        (r'\bRd\b', 'Road'),
+        (r'\bDr\b', 'Drive'),
+        (r'\bPl\b', 'Place'),
+        (r'\bPk\b', 'Park'),
+        (r'\bNY\b', 'New York'),
+        (r'\bLA\b', 'Los Angeles'),
+        (r'\bSF\b', 'San Francisco'),
+        (r'\bNYC\b', 'New York City'),
+        (r'\bUS\b', 'United States'),
+        (r'\bUSA\b', 'United States'),
+        (r'\bUK\b', 'United Kingdom'),
+    )
+]
+_LOCATION_PREFIX = re.compile(r'^(near|at|in|on|by)\s+', re.IGNORECASE)
+
+
 def preprocess_location(location_text: str) -> List[str]:
     """
     Preprocesses location text and generates multiple search variations.
@@ -92,28 +125,10 @@ def preprocess_location(location_text: str) -> List[str]:
     # Original location (always try first)
     search_variations.append(location)
 
-    # Common abbreviations and expansions
-    abbreviations = {
-        r'\bSt\b': 'Street',
-        r'\bAve\b': 'Avenue',
-        r'\bBlvd\b': 'Boulevard',
-        r'\bRd\b': 'Road',
-        r'\bDr\b': 'Drive',
-        r'\bPl\b': 'Place',
-        r'\bPk\b': 'Park',
-        r'\bNY\b': 'New York',
-        r'\bLA\b': 'Los Angeles',
-        r'\bSF\b': 'San Francisco',
-        r'\bNYC\b': 'New York City',
-        r'\bUS\b': 'United States',
-        r'\bUSA\b': 'United States',
-        r'\bUK\b': 'United Kingdom',
-    }
-
     # Try expanded abbreviations
     expanded = location
-    for abbr, full in abbreviations.items():
-        expanded = re.sub(abbr, full, expanded, flags=re.IGNORECASE)
+    for abbr, full in _ABBREVIATIONS:
+        expanded = abbr.sub(full, expanded)
 
     if expanded != location:
         search_variations.append(expanded)
@@ -126,7 +141,7 @@ def preprocess_location(location_text: str) -> List[str]:
 
     # Extract and try just the main location parts
     # Remove common prefixes
-    clean_location = re.sub(r'^(near|at|in|on|by)\s+', '', location, flags=re.IGNORECASE)
+    clean_location = _LOCATION_PREFIX.sub('', location)
     if clean_location != location:
         search_variations.append(clean_location)
 
@@ -149,103 +164,137 @@ def preprocess_location(location_text: str) -> List[str]:
 
     return unique_variations
 
-# ─── Enhanced geocoding with better error handling ────────────────────────
+# ─── Geocoding providers ─────────────────────────────────────────────────
 
-def geocode_location(location_text: str) -> Dict:
+def _try_google(variation: str) -> Optional[Dict]:
     """
-    Enhanced geocoding with multiple services and better preprocessing.
+    Google Maps Geocoding API (most accurate). Returns None when it has no answer.
     """
-    if not location_text or not location_text.strip():
-        return {
-            "status": "error",
-            "error_message": "Location text cannot be empty"
+    try:
+        url = "https://maps.googleapis.com/maps/api/geocode/json"
+        params = {
+            "address": variation,
+            "key": GEOCODING_API_KEY,
+            "language": "en"  # Force English results for consistency
         }
+        response = _http.get(url, params=params, timeout=15)
+        response.raise_for_status()
+        data = orjson.loads(response.content)
+
+        if data["status"] == "OK" and data["results"]:
+            result = data["results"][0]
+            return {
+                "status": "success",
+                "address": result["formatted_address"],
+                "latitude": result["geometry"]["location"]["lat"],
+                "longitude": result["geometry"]["location"]["lng"],
+                "source": "Google Maps",
+                "search_term": variation
+            }
+        elif data["status"] == "ZERO_RESULTS":
+            print(f"Google Maps: No results for '{variation}'")
+        else:
+            print(f"Google Maps error: {data.get('status')} - {data.get('error_message', 'Unknown error')}")
 
-    # Get multiple search variations
-    search_variations = preprocess_location(location_text)
-    print(f"Trying geocoding variations: {search_variations}")
-
-    # Try each variation with each service
-    for variation in search_variations:
-        print(f"Trying variation: '{variation}'")
+    except requests.exceptions.RequestException as e:
+        print(f"Google Maps API request failed for '{variation}': {e}")
+    except Exception as e:
+        print(f"Google Maps API failed for '{variation}': {e}")
+    return None
 
-        # Option 1: Google Maps Geocoding API (most accurate)
-        if GEOCODING_API_KEY:
-            try:
-                url = "https://maps.googleapis.com/maps/api/geocode/json"
-                params = {
-                    "address": variation,
-                    "key": GEOCODING_API_KEY,
-                    "language": "en"  # Force English results for consistency
-                }
-                response = requests.get(url, params=params, timeout=15)
-                response.raise_for_status()
-                data = response.json()
 
-                if data["status"] == "OK" and data["results"]:
-                    result = data["results"][0]
-                    return {
-                        "status": "success",
-                        "address": result["formatted_address"],
-                        "latitude": result["geometry"]["location"]["lat"],
-                        "longitude": result["geometry"]["location"]["lng"],
-                        "source": "Google Maps",
-                        "search_term": variation
-                    }
-                elif data["status"] == "ZERO_RESULTS":
-                    print(f"Google Maps: No results for '{variation}'")
-                    continue
-                else:
-                    print(f"Google Maps error: {data.get('status')} - {data.get('error_message', 'Unknown error')}")
-
-            except requests.exceptions.RequestException as e:
-                print(f"Google Maps API request failed for '{variation}': {e}")
-            except Exception as e:
-                print(f"Google Maps API failed for '{variation}': {e}")
+def _try_nominatim(variation: str) -> Optional[Dict]:
+    """
+    Nominatim (OpenStreetMap) - More detailed search. Returns None when it has no answer.
+    """
+    try:
+        url = "https://nominatim.openstreetmap.org/search"
+        params = {
+            "q": variation,
+            "format": "json",
+            "addressdetails": 1,
+            "limit": 3,  # Get multiple results to pick the best one
+            "dedupe": 1,
+            "accept-language": "en"
+        }
+        headers = {
+            "User-Agent": "ItemRadar-LostFound/1.0 (contact@itemradar.com)"
+        }
 
-        # Option 2: Nominatim (OpenStreetMap) - More detailed search
-        try:
-            url = "https://nominatim.openstreetmap.org/search"
-            params = {
-                "q": variation,
-                "format": "json",
-                "addressdetails": 1,
-                "limit": 3,  # Get multiple results to pick the best one
-                "dedupe": 1,
-                "accept-language": "en"
-            }
-            headers = {
-                "User-Agent": "ItemRadar-LostFound/1.0 (contact@itemradar.com)"
+        response = _http.get(url, params=params, headers=headers, timeout=15)
+        response.raise_for_status()
+        data = orjson.loads(response.content)
+
+        if data:
+            # Pick the result with highest importance score
+            best_result = max(data, key=lambda x: float(x.get('importance', 0)))
+
+            return {
+                "status": "success",
+                "address": best_result["display_name"],
+                "latitude": float(best_result["lat"]),
+                "longitude": float(best_result["lon"]),
+                "source": "OpenStreetMap",
+                "search_term": variation
             }
+        else:
+            print(f"Nominatim: No results for '{variation}'")
 
-            response = requests.get(url, params=params, headers=headers, timeout=15)
-            response.raise_for_status()
-            data = response.json()
-
-            if data:
-                # Pick the result with highest importance score
-                best_result = max(data, key=lambda x: float(x.get('importance', 0)))
-
-                return {
-                    "status": "success",
-                    "address": best_result["display_name"],
-                    "latitude": float(best_result["lat"]),
-                    "longitude": float(best_result["lon"]),
-                    "source": "OpenStreetMap",
-                    "search_term": variation
-                }
-            else:
-                print(f"Nominatim: No results for '{variation}'")
+    except requests.exceptions.RequestException as e:
+        print(f"Nominatim request failed for '{variation}': {e}")
+    except Exception as e:
+        print(f"Nominatim failed for '{variation}': {e}")
+    return None
 
-        except requests.exceptions.RequestException as e:
-            print(f"Nominatim request failed for '{variation}': {e}")
-        except Exception as e:
-            print(f"Nominatim failed for '{variation}': {e}")
 
-        # Small delay between attempts to be respectful to free services
-        time.sleep(0.5)
+# Hedging pool, sized like the API's tool thread pool that calls geocode_location
+_geocode_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("AGENT_THREADS", "64")),
+    thread_name_prefix="geocode",
+)
+# How long Google Maps gets on its own before Nominatim is asked as well
+GEOCODE_HEDGE_DELAY = 1.0
 
-    # Final fallback: Use Gemini to extract and simplify location
+
+def _geocode_variation(variation: str) -> Optional[Dict]:
+    """
+    Delayed hedge: Google Maps is asked first, and Nominatim only if Google has no
+    answer or hasn't replied within GEOCODE_HEDGE_DELAY. In the latter case the
+    first successful result of the two wins.
+    """
+    if not GEOCODING_API_KEY:
+        return _try_nominatim(variation)
+
+    google = _geocode_pool.submit(_try_google, variation)
+    try:
+        result = google.result(timeout=GEOCODE_HEDGE_DELAY)
+    except FuturesTimeoutError:
+        pass
+    else:
+        return result if result is not None else _try_nominatim(variation)
+
+    # Google is slow: race it against Nominatim
+    nominatim = _geocode_pool.submit(_try_nominatim, variation)
+    for future in as_completed((google, nominatim)):
+        result = future.result()
+        if result is not None:
+            return result
+    return None
+
+
+# ─── Gemini-assisted fallback ────────────────────────────────────────────
+
+# The LLM fallback is a multi-second call that only runs once every variation has
+# failed: bound how long it may take and how many run at once, so a burst of
+# unresolvable locations can't tie up the tool threads.
+GEMINI_GEOCODE_TIMEOUT = 5
+_gemini_geocode_slots = threading.BoundedSemaphore(2)
+
+
+def _gemini_geocode(location_text: str) -> Optional[Dict]:
+    """
+    Final fallback: Use Gemini to extract and simplify location.
+    """
     try:
         print("Trying Gemini-assisted geocoding...")
         model = genai.GenerativeModel("gemini-pro")
@@ -265,7 +314,7 @@ def geocode_location(location_text: str) -> Dict:
         - "downtown chicago" → "Downtown Chicago, Illinois, United States"
         """
 
-        response = model.generate_content(prompt)
+        response = model.generate_content(prompt, request_options={"timeout": GEMINI_GEOCODE_TIMEOUT})
         suggestions = response.text.strip().split('\n')
 
         # Try geocoding each suggestion
@@ -287,8 +336,8 @@ def geocode_location(location_text: str) -> Dict:
                 }
                 headers = {"User-Agent": "ItemRadar-LostFound/1.0"}
 
-                geo_response = requests.get(url, params=params, headers=headers, timeout=10)
-                geo_data = geo_response.json()
+                geo_response = _http.get(url, params=params, headers=headers, timeout=10)
+                geo_data = orjson.loads(geo_response.content)
 
                 if geo_data:
                     result = geo_data[0]
@@ -309,6 +358,74 @@ def geocode_location(location_text: str) -> Dict:
     except Exception as e:
         print(f"Gemini fallback failed: {e}")
 
+    return None
+
+
+# ─── Enhanced geocoding with better error handling ────────────────────────
+
+# Successful lookups keyed by the normalized location text: users name the same
+# places over and over, and a hit skips every geocoder round trip below.
+GEOCODE_CACHE_TTL = 7 * 24 * 60 * 60
+GEOCODE_CACHE_SIZE = 4096
+_geocode_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_geocode_cache_lock = threading.Lock()  # tool calls run in worker threads
+
+
+def geocode_location(location_text: str) -> Dict:
+    """
+    Enhanced geocoding with multiple services and better preprocessing.
+    """
+    key = " ".join(location_text.lower().split()) if location_text else ""
+    with _geocode_cache_lock:
+        entry = _geocode_cache.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            _geocode_cache.move_to_end(key)
+            return dict(entry[1])
+
+    result = _geocode_uncached(location_text)
+
+    # Only successful lookups are cached; failures may be transient
+    if result.get("status") == "success":
+        with _geocode_cache_lock:
+            _geocode_cache[key] = (time.monotonic() + GEOCODE_CACHE_TTL, result)
+            if len(_geocode_cache) > GEOCODE_CACHE_SIZE:
+                _geocode_cache.popitem(last=False)
+    return result
+
+
+def _geocode_uncached(location_text: str) -> Dict:
+    if not location_text or not location_text.strip():
+        return {
+            "status": "error",
+            "error_message": "Location text cannot be empty"
+        }
+
+    # Get multiple search variations
+    search_variations = preprocess_location(location_text)
+    print(f"Trying geocoding variations: {search_variations}")
+
+    # Try each variation with both services
+    for variation in search_variations:
+        print(f"Trying variation: '{variation}'")
+
+        result = _geocode_variation(variation)
+        if result is not None:
+            return result
+
+        # Small delay between attempts to be respectful to free services
+        time.sleep(0.5)
+
+    # Final fallback: Use Gemini to extract and simplify location
+    if _gemini_geocode_slots.acquire(timeout=GEMINI_GEOCODE_TIMEOUT):
+        try:
+            result = _gemini_geocode(location_text)
+        finally:
+            _gemini_geocode_slots.release()
+        if result is not None:
+            return result
+    else:
+        print("Skipping Gemini-assisted geocoding: fallback slots busy")
+
     # If all else fails, provide helpful error message
     return {
         "status": "error",
@@ -365,7 +482,7 @@ root_agent = Agent(
         "IMPORTANT: Do NOT use any extract_description function. You have multimodal capabilities - "
         "analyze images directly and create descriptions yourself."
     ),
-    tools=[geocode_location],
+    tools=[run_in_thread(geocode_location)],
 )
 
 lens_agent = root_agent
@@ -1,85 +1,193 @@
+from __future__ import annotations
+
 from google.adk.agents import LlmAgent
 from google.adk.tools import FunctionTool
 from google.generativeai import GenerativeModel
-from google.cloud import firestore
+from google.cloud import aiplatform, firestore
+from google.cloud.firestore import FieldFilter
+from vertexai.language_models import TextEmbeddingModel
 import os
 import json
 import logging
+import threading
+
+from ...bootstrap import init_once
+from ...tool_utils import run_in_thread
 
 # Load environment variables
 PROJECT_ID = os.getenv("PROJECT_ID")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+# Optional: the deployed Vector Search index holding the found-item embeddings.
+# When set, searches only hand Gemini the nearest items instead of the whole collection.
+INDEX_ENDPOINT_ID = os.getenv("INDEX_ENDPOINT_ID")
+DEPLOYED_INDEX_ID = os.getenv("DEPLOYED_INDEX_ID")
+# Same variable and default as the lens agent, which embeds the indexed items
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-004")
+NUM_NEIGHBORS = 10
 
 if not PROJECT_ID or not GOOGLE_API_KEY:
     raise RuntimeError("PROJECT_ID and GOOGLE_API_KEY must be set")
 
-# Initialize Firestore client
+init_once()
+
+# Initialize Firestore client and the matching model once, shared by every search
 db = firestore.Client(project=PROJECT_ID)
+model = GenerativeModel("gemini-2.0-flash")
+
+
+# The only found_items fields a search reads: coordinates, status and timestamp
+# stay on the server
+MATCH_FIELDS = ["id", "description", "address", "email", "date_found", "additional_details"]
+
+
+def _to_item(item: dict) -> dict | None:
+    # More flexible field checking - only require id and description
+    if "id" not in item or "description" not in item:
+        return None
+    return {
+        "id": item["id"],
+        "description": item["description"],
+        "location": item.get("address", ""),  # Optional field
+        "contact": item.get("email", ""),
+        "date_found": item.get("date_found", ""),
+        "additional_details": item.get("additional_details", "")
+    }
 
 
 def fetch_items_from_firestore() -> list[dict]:
     """Fetch all items from Firestore with complete details"""
     items_ref = db.collection("found_items")
-    docs = items_ref.stream()
+    docs = items_ref.select(MATCH_FIELDS).stream()
 
     items = []
     for doc in docs:
-        item = doc.to_dict()
-        # More flexible field checking - only require id and description
-        if "id" in item and "description" in item:
-            items.append({
-                "id": item["id"],
-                "description": item["description"],
-                "location": item.get("address", ""),  # Optional field
-                "contact": item.get("email", ""),
-                "date_found": item.get("date_found", ""),
-                "additional_details": item.get("additional_details", "")
-            })
+        item = _to_item(doc.to_dict())
+        if item is not None:
+            items.append(item)
     return items
 
 
-def get_items(query: str) -> str:  # Changed function name to match FILE1
+def fetch_unindexed_items() -> list[dict]:
     """
-    Use the LLM to select the similar items from Firestore based on the user query.
-    This function mirrors the working FILE1 implementation.
+    Fetch the items that are not in the Vector Search index (no embedding, a failed
+    upsert, or seeded directly): a shortlist from the index can never include them.
     """
+    docs = (
+        db.collection("found_items")
+        .where(filter=FieldFilter("indexed", "==", False))
+        .select(MATCH_FIELDS)
+        .stream()
+    )
+
+    items = []
+    for doc in docs:
+        item = _to_item(doc.to_dict())
+        if item is not None:
+            items.append(item)
+    return items
+
+
+# Vector search clients, created on first use
+_embed: TextEmbeddingModel | None = None
+_endpoint: aiplatform.MatchingEngineIndexEndpoint | None = None
+_vector_lock = threading.Lock()
+
+
+def _vector_clients() -> tuple[TextEmbeddingModel, aiplatform.MatchingEngineIndexEndpoint]:
+    global _embed, _endpoint
+    if _endpoint is None:
+        with _vector_lock:
+            if _endpoint is None:
+                _embed = TextEmbeddingModel.from_pretrained(EMBEDDING_MODEL)
+                _endpoint = aiplatform.MatchingEngineIndexEndpoint(INDEX_ENDPOINT_ID)
+    return _embed, _endpoint
+
+
+def fetch_candidate_items(query: str) -> list[dict] | None:
+    """
+    Fetch the found items nearest to the query from Vector Search, reading their
+    details in a single Firestore batch get. Returns None when vector search is
+    not configured or fails, so the caller can fall back to the full collection.
+    """
+    if not INDEX_ENDPOINT_ID or not DEPLOYED_INDEX_ID:
+        return None
     try:
-        model = GenerativeModel("gemini-2.0-flash")
-        items = fetch_items_from_firestore()
+        embed, endpoint = _vector_clients()
+        vector = embed.get_embeddings([query])[0].values
+        neighbors = endpoint.find_neighbors(
+            deployed_index_id=DEPLOYED_INDEX_ID,
+            queries=[vector],
+            num_neighbors=NUM_NEIGHBORS,
+        )[0]
+        refs = [db.collection("found_items").document(neighbor.id) for neighbor in neighbors]
+
+        items = []
+        for doc in db.get_all(refs, field_paths=MATCH_FIELDS):
+            item = _to_item(doc.to_dict()) if doc.exists else None
+            if item is not None:
+                items.append(item)
+        return items
+    except Exception as e:
+        logging.warning(f"Vector search failed, scanning all items instead: {e}")
+        return None
 
-        if not items:
-            return json.dumps({"matches": [], "error": "No items found in Firestore."})
 
-        items_block = "\n".join(
-    f"{item['id']}: {item['description']} "
-    f"(Location: {item.get('location','N/A')}, Contact: {item.get('contact','N/A')})"
-    for item in items
-)
-        prompt = f"""
+MATCHER_INSTRUCTIONS = """
 You are an expert at matching item descriptions.
 
-Here is a user's query for a lost item:
-"{query}"
-
-Below is a list of items that people have found:
-{items_block}
+You will be given a list of items that people have found, followed by a user's query for a lost item.
 
 Your task is to return **only the items from the list** that are semantically similar to the user's query.
 The descriptions do not need to match exactly — even partial or vague similarities are acceptable.
 Do not generate new items. Do not explain. Do not say anything outside the response format.
 
 Respond strictly in this exact JSON format:
-{{
+{
   "matches": [
-    {{ "id": "item_id", "description": "item description", "location": "…", "contact": "…" }},
+    { "id": "item_id", "description": "item description", "location": "…", "contact": "…" },
     …
   ]
-}}
+}
 
 If nothing matches, return:
-{{
+{
   "matches": []
-}}
+}
+"""
+
+
+def get_items(query: str) -> str:  # Changed function name to match FILE1
+    """
+    Use the LLM to select the similar items from Firestore based on the user query.
+    This function mirrors the working FILE1 implementation.
+    """
+    try:
+        # With vector search set up, Gemini only re-ranks the nearest neighbours plus
+        # the items the index doesn't hold; otherwise it sees the whole collection
+        candidates = fetch_candidate_items(query)
+        if candidates is None:
+            items = fetch_items_from_firestore()
+        else:
+            merged = {item["id"]: item for item in candidates}
+            for item in fetch_unindexed_items():
+                merged.setdefault(item["id"], item)
+            items = list(merged.values())
+
+        if not items:
+            return json.dumps({"matches": [], "error": "No items found in Firestore."})
+
+        items_block = "\n".join(
+    f"{item['id']}: {item['description']} "
+    f"(Location: {item.get('location','N/A')}, Contact: {item.get('contact','N/A')})"
+    for item in items
+)
+        # Fixed instructions first, then the candidate items, then the query
+        prompt = f"""{MATCHER_INSTRUCTIONS}
+Below is a list of items that people have found:
+{items_block}
+
+Here is a user's query for a lost item:
+"{query}"
 """
 
         response = model.generate_content(prompt)
@@ -94,7 +202,7 @@ If nothing matches, return:
 
 
 # Create the tool with the same function name as FILE1
-tool = FunctionTool(get_items)
+tool = FunctionTool(run_in_thread(get_items))
 
 # Define the matcher agent exactly like FILE1
 root_agent = LlmAgent(
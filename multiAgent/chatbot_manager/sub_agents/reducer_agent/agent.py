@@ -1,15 +1,14 @@
-import os
 import re
 from collections import Counter
-from dotenv import load_dotenv
 from google.adk.agents import Agent
 from google.adk.tools.tool_context import ToolContext
-from google.generativeai import GenerativeModel, configure as configure_gemini
+from google.generativeai import GenerativeModel
 
-load_dotenv()
+from ...bootstrap import init_once
+from ...tool_utils import run_in_thread
 
-# Configure Gemini API
-configure_gemini(api_key=os.getenv("GEMINI_API_KEY"))
+# Loads .env and configures the Gemini API (shared by all sub-agents)
+init_once()
 
 
 def analyze_items_and_generate_question(texts: list[str], tool_context: ToolContext) -> dict:
@@ -135,5 +134,5 @@ reducer_agent = Agent(
     Always return just the question text - no explanations or analysis.
     Let your intelligence shine through better, more targeted questions.
     """,
-    tools=[analyze_items_and_generate_question],
+    tools=[run_in_thread(analyze_items_and_generate_question)],
 )
\ No newline at end of file
@@ -0,0 +1,14 @@
+import asyncio
+import functools
+
+
+def run_in_thread(func):
+    """
+    Expose a blocking tool (HTTP, Firestore, Gemini calls) as a coroutine so ADK
+    awaits it in a worker thread instead of running it on the event loop.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    return wrapper
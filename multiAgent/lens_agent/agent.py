@@ -6,13 +6,17 @@ SOLUTION: Enhanced geocoding with better fallbacks and location processing
 
 from __future__ import annotations
 
-import datetime as dt
 import os
-import uuid
+import secrets
 import re
-import json
+import orjson
 import requests
+from urllib3.util.retry import Retry
 import time
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from typing import Dict, List, Optional
 
 from dotenv import load_dotenv
@@ -37,27 +41,115 @@ if not all([PROJECT_ID, REGION, INDEX_ID, GOOGLE_API_KEY]):
 aiplatform.init(project=PROJECT_ID, location=REGION)
 genai.configure(api_key=GOOGLE_API_KEY)
 
-# Updated embedding model - using the latest stable version
-try:
-    # Try the latest text embedding model first
-    _embed = TextEmbeddingModel.from_pretrained("text-embedding-004")
-except Exception:
-    try:
-        # Fallback to gecko-003 if 004 is not available
-        _embed = TextEmbeddingModel.from_pretrained("textembedding-gecko@003")
-    except Exception:
-        try:
-            # Final fallback to gecko-002
-            _embed = TextEmbeddingModel.from_pretrained("textembedding-gecko@002")
-        except Exception as e:
-            print(f"Warning: Could not load any embedding model: {e}")
-            _embed = None
+# One keep-alive HTTP session for all geocoding calls: repeated lookups reuse the
+# TLS connection to the geocoder instead of opening a new one per request.
+# Sized for the API's tool thread pool, which calls geocode_location concurrently.
+# Gateway errors (common on the free Nominatim endpoint) get two quick retries on
+# the pooled connection before falling through to the next geocoder. Read timeouts
+# are not retried and Retry-After is ignored, so a call never waits much past its
+# own timeout.
+_http = requests.Session()
+_http.mount("https://", requests.adapters.HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=64,
+    max_retries=Retry(
+        total=2,
+        read=0,
+        status=2,
+        backoff_factor=0.2,
+        status_forcelist=(502, 503, 504),
+        respect_retry_after_header=False,
+    ),
+))
+
+# Embedding model for the found-item vectors. The matcher embeds its queries with
+# the model named by the same EMBEDDING_MODEL variable, so there is deliberately no
+# fallback to another model here: if this one can't be loaded, items are saved
+# without a vector and the matcher keeps scanning them as unindexed.
+# Loaded on first use and shared by every thread afterwards.
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-004")
+_embed: TextEmbeddingModel | None = None
+_embed_loaded = False
+_embed_lock = threading.Lock()
+
+
+def get_embedding_model() -> Optional[TextEmbeddingModel]:
+    """
+    Returns the EMBEDDING_MODEL model, or None if it can't be loaded.
+    """
+    global _embed, _embed_loaded
+    if _embed_loaded:
+        return _embed
+
+    with _embed_lock:
+        if not _embed_loaded:
+            try:
+                _embed = TextEmbeddingModel.from_pretrained(EMBEDDING_MODEL)
+            except Exception as e:
+                print(f"Warning: Could not load embedding model {EMBEDDING_MODEL}: {e}")
+            _embed_loaded = True
+    return _embed
+
+# Firestore client and Matching Engine handle: both are created once per process,
+# on first use, and shared by every registration thread.
+_db: firestore.Client | None = None
+_db_lock = threading.Lock()
+
+
+def get_db() -> firestore.Client:
+    """
+    Returns the shared Firestore client, built on first use.
+    """
+    global _db
+    if _db is None:
+        with _db_lock:
+            if _db is None:
+                _db = firestore.Client(project=PROJECT_ID)
+    return _db
+
 
-_db: firestore.Client | None = None  # lazy client
+# Building the Matching Engine handle fetches the index metadata over the network,
+# so it is created once per process and reused by every registration.
+_index: aiplatform.MatchingEngineIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_matching_index() -> aiplatform.MatchingEngineIndex:
+    """
+    Returns the shared Matching Engine index handle, built on first use.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = aiplatform.MatchingEngineIndex(INDEX_ID)
+    return _index
 
 
 # ─── Enhanced location preprocessing ────────────────────────────────────
 
+# Common abbreviations and expansions, compiled once (applied in this order)
+_ABBREVIATIONS = [
+    (re.compile(pattern, re.IGNORECASE), full) for pattern, full in (
+        (r'\bSt\b', 'Street'),
+        (r'\bAve\b', 'Avenue'),
+        (r'\bBlvd\b', 'Boulevard'),
+        (r'\bRd\b', 'Road'),
+        (r'\bDr\b', 'Drive'),
+        (r'\bPl\b', 'Place'),
+        (r'\bPk\b', 'Park'),
+        (r'\bNY\b', 'New York'),
+        (r'\bLA\b', 'Los Angeles'),
+        (r'\bSF\b', 'San Francisco'),
+        (r'\bNYC\b', 'New York City'),
+        (r'\bUS\b', 'United States'),
+        (r'\bUSA\b', 'United States'),
+        (r'\bUK\b', 'United Kingdom'),
+    )
+]
+_LOCATION_PREFIX = re.compile(r'^(near|at|in|on|by)\s+', re.IGNORECASE)
+
+
 def preprocess_location(location_text: str) -> List[str]:
     """
     Preprocesses location text and generates multiple search variations.
@@ -72,28 +164,10 @@ def preprocess_location(location_text: str) -> List[str]:
     # Original location (always try first)
     search_variations.append(location)
 
-    # Common abbreviations and expansions
-    abbreviations = {
-        r'\bSt\b': 'Street',
-        r'\bAve\b': 'Avenue',
-        r'\bBlvd\b': 'Boulevard',
-        r'\bRd\b': 'Road',
-        r'\bDr\b': 'Drive',
-        r'\bPl\b': 'Place',
-        r'\bPk\b': 'Park',
-        r'\bNY\b': 'New York',
-        r'\bLA\b': 'Los Angeles',
-        r'\bSF\b': 'San Francisco',
-        r'\bNYC\b': 'New York City',
-        r'\bUS\b': 'United States',
-        r'\bUSA\b': 'United States',
-        r'\bUK\b': 'United Kingdom',
-    }
-
     # Try expanded abbreviations
     expanded = location
-    for abbr, full in abbreviations.items():
-        expanded = re.sub(abbr, full, expanded, flags=re.IGNORECASE)
+    for abbr, full in _ABBREVIATIONS:
+        expanded = abbr.sub(full, expanded)
 
     if expanded != location:
         search_variations.append(expanded)
@@ -106,7 +180,7 @@ def preprocess_location(location_text: str) -> List[str]:
 
     # Extract and try just the main location parts
     # Remove common prefixes
-    clean_location = re.sub(r'^(near|at|in|on|by)\s+', '', location, flags=re.IGNORECASE)
+    clean_location = _LOCATION_PREFIX.sub('', location)
     if clean_location != location:
         search_variations.append(clean_location)
 
@@ -130,103 +204,137 @@ def preprocess_location(location_text: str) -> List[str]:
     return unique_variations
 
 
-# ─── Enhanced geocoding with better error handling ────────────────────────
+# ─── Geocoding providers ─────────────────────────────────────────────────
 
-def geocode_location(location_text: str) -> Dict:
+def _try_google(variation: str) -> Optional[Dict]:
     """
-    Enhanced geocoding with multiple services and better preprocessing.
+    Google Maps Geocoding API (most accurate). Returns None when it has no answer.
     """
-    if not location_text or not location_text.strip():
-        return {
-            "status": "error",
-            "error_message": "Location text cannot be empty"
+    try:
+        url = "https://maps.googleapis.com/maps/api/geocode/json"
+        params = {
+            "address": variation,
+            "key": GEOCODING_API_KEY,
+            "language": "en"  # Force English results for consistency
         }
+        response = _http.get(url, params=params, timeout=15)
+        response.raise_for_status()
+        data = orjson.loads(response.content)
+
+        if data["status"] == "OK" and data["results"]:
+            result = data["results"][0]
+            return {
+                "status": "success",
+                "address": result["formatted_address"],
+                "latitude": result["geometry"]["location"]["lat"],
+                "longitude": result["geometry"]["location"]["lng"],
+                "source": "Google Maps",
+                "search_term": variation
+            }
+        elif data["status"] == "ZERO_RESULTS":
+            print(f"Google Maps: No results for '{variation}'")
+        else:
+            print(f"Google Maps error: {data.get('status')} - {data.get('error_message', 'Unknown error')}")
 
-    # Get multiple search variations
-    search_variations = preprocess_location(location_text)
-    print(f"Trying geocoding variations: {search_variations}")
-
-    # Try each variation with each service
-    for variation in search_variations:
-        print(f"Trying variation: '{variation}'")
+    except requests.exceptions.RequestException as e:
+        print(f"Google Maps API request failed for '{variation}': {e}")
+    except Exception as e:
+        print(f"Google Maps API failed for '{variation}': {e}")
+    return None
 
-        # Option 1: Google Maps Geocoding API (most accurate)
-        if GEOCODING_API_KEY:
-            try:
-                url = "https://maps.googleapis.com/maps/api/geocode/json"
-                params = {
-                    "address": variation,
-                    "key": GEOCODING_API_KEY,
-                    "language": "en"  # Force English results for consistency
-                }
-                response = requests.get(url, params=params, timeout=15)
-                response.raise_for_status()
-                data = response.json()
 
-                if data["status"] == "OK" and data["results"]:
-                    result = data["results"][0]
-                    return {
-                        "status": "success",
-                        "address": result["formatted_address"],
-                        "latitude": result["geometry"]["location"]["lat"],
-                        "longitude": result["geometry"]["location"]["lng"],
-                        "source": "Google Maps",
-                        "search_term": variation
-                    }
-                elif data["status"] == "ZERO_RESULTS":
-                    print(f"Google Maps: No results for '{variation}'")
-                    continue
-                else:
-                    print(f"Google Maps error: {data.get('status')} - {data.get('error_message', 'Unknown error')}")
-
-            except requests.exceptions.RequestException as e:
-                print(f"Google Maps API request failed for '{variation}': {e}")
-            except Exception as e:
-                print(f"Google Maps API failed for '{variation}': {e}")
+def _try_nominatim(variation: str) -> Optional[Dict]:
+    """
+    Nominatim (OpenStreetMap) - More detailed search. Returns None when it has no answer.
+    """
+    try:
+        url = "https://nominatim.openstreetmap.org/search"
+        params = {
+            "q": variation,
+            "format": "json",
+            "addressdetails": 1,
+            "limit": 3,  # Get multiple results to pick the best one
+            "dedupe": 1,
+            "accept-language": "en"
+        }
+        headers = {
+            "User-Agent": "ItemRadar-LostFound/1.0 (contact@itemradar.com)"
+        }
 
-        # Option 2: Nominatim (OpenStreetMap) - More detailed search
-        try:
-            url = "https://nominatim.openstreetmap.org/search"
-            params = {
-                "q": variation,
-                "format": "json",
-                "addressdetails": 1,
-                "limit": 3,  # Get multiple results to pick the best one
-                "dedupe": 1,
-                "accept-language": "en"
-            }
-            headers = {
-                "User-Agent": "ItemRadar-LostFound/1.0 (contact@itemradar.com)"
+        response = _http.get(url, params=params, headers=headers, timeout=15)
+        response.raise_for_status()
+        data = orjson.loads(response.content)
+
+        if data:
+            # Pick the result with highest importance score
+            best_result = max(data, key=lambda x: float(x.get('importance', 0)))
+
+            return {
+                "status": "success",
+                "address": best_result["display_name"],
+                "latitude": float(best_result["lat"]),
+                "longitude": float(best_result["lon"]),
+                "source": "OpenStreetMap",
+                "search_term": variation
             }
+        else:
+            print(f"Nominatim: No results for '{variation}'")
 
-            response = requests.get(url, params=params, headers=headers, timeout=15)
-            response.raise_for_status()
-            data = response.json()
-
-            if data:
-                # Pick the result with highest importance score
-                best_result = max(data, key=lambda x: float(x.get('importance', 0)))
-
-                return {
-                    "status": "success",
-                    "address": best_result["display_name"],
-                    "latitude": float(best_result["lat"]),
-                    "longitude": float(best_result["lon"]),
-                    "source": "OpenStreetMap",
-                    "search_term": variation
-                }
-            else:
-                print(f"Nominatim: No results for '{variation}'")
+    except requests.exceptions.RequestException as e:
+        print(f"Nominatim request failed for '{variation}': {e}")
+    except Exception as e:
+        print(f"Nominatim failed for '{variation}': {e}")
+    return None
 
-        except requests.exceptions.RequestException as e:
-            print(f"Nominatim request failed for '{variation}': {e}")
-        except Exception as e:
-            print(f"Nominatim failed for '{variation}': {e}")
 
-        # Small delay between attempts to be respectful to free services
-        time.sleep(0.5)
+# Hedging pool, sized like the API's tool thread pool that calls geocode_location
+_geocode_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("AGENT_THREADS", "64")),
+    thread_name_prefix="geocode",
+)
+# How long Google Maps gets on its own before Nominatim is asked as well
+GEOCODE_HEDGE_DELAY = 1.0
 
-    # Final fallback: Use Gemini to extract and simplify location
+
+def _geocode_variation(variation: str) -> Optional[Dict]:
+    """
+    Delayed hedge: Google Maps is asked first, and Nominatim only if Google has no
+    answer or hasn't replied within GEOCODE_HEDGE_DELAY. In the latter case the
+    first successful result of the two wins.
+    """
+    if not GEOCODING_API_KEY:
+        return _try_nominatim(variation)
+
+    google = _geocode_pool.submit(_try_google, variation)
+    try:
+        result = google.result(timeout=GEOCODE_HEDGE_DELAY)
+    except FuturesTimeoutError:
+        pass
+    else:
+        return result if result is not None else _try_nominatim(variation)
+
+    # Google is slow: race it against Nominatim
+    nominatim = _geocode_pool.submit(_try_nominatim, variation)
+    for future in as_completed((google, nominatim)):
+        result = future.result()
+        if result is not None:
+            return result
+    return None
+
+
+# ─── Gemini-assisted fallback ────────────────────────────────────────────
+
+# The LLM fallback is a multi-second call that only runs once every variation has
+# failed: bound how long it may take and how many run at once, so a burst of
+# unresolvable locations can't tie up the tool threads.
+GEMINI_GEOCODE_TIMEOUT = 5
+_gemini_geocode_slots = threading.BoundedSemaphore(2)
+
+
+def _gemini_geocode(location_text: str) -> Optional[Dict]:
+    """
+    Final fallback: Use Gemini to extract and simplify location.
+    """
     try:
         print("Trying Gemini-assisted geocoding...")
         model = genai.GenerativeModel("gemini-pro")
@@ -246,7 +354,7 @@ def geocode_location(location_text: str) -> Dict:
         - "downtown chicago" → "Downtown Chicago, Illinois, United States"
         """
 
-        response = model.generate_content(prompt)
+        response = model.generate_content(prompt, request_options={"timeout": GEMINI_GEOCODE_TIMEOUT})
         suggestions = response.text.strip().split('\n')
 
         # Try geocoding each suggestion
@@ -268,8 +376,8 @@ def geocode_location(location_text: str) -> Dict:
                 }
                 headers = {"User-Agent": "ItemRadar-LostFound/1.0"}
 
-                geo_response = requests.get(url, params=params, headers=headers, timeout=10)
-                geo_data = geo_response.json()
+                geo_response = _http.get(url, params=params, headers=headers, timeout=10)
+                geo_data = orjson.loads(geo_response.content)
 
                 if geo_data:
                     result = geo_data[0]
@@ -290,6 +398,47 @@ def geocode_location(location_text: str) -> Dict:
     except Exception as e:
         print(f"Gemini fallback failed: {e}")
 
+    return None
+
+
+# ─── Enhanced geocoding with better error handling ────────────────────────
+
+def geocode_location(location_text: str) -> Dict:
+    """
+    Enhanced geocoding with multiple services and better preprocessing.
+    """
+    if not location_text or not location_text.strip():
+        return {
+            "status": "error",
+            "error_message": "Location text cannot be empty"
+        }
+
+    # Get multiple search variations
+    search_variations = preprocess_location(location_text)
+    print(f"Trying geocoding variations: {search_variations}")
+
+    # Try each variation with both services
+    for variation in search_variations:
+        print(f"Trying variation: '{variation}'")
+
+        result = _geocode_variation(variation)
+        if result is not None:
+            return result
+
+        # Small delay between attempts to be respectful to free services
+        time.sleep(0.5)
+
+    # Final fallback: Use Gemini to extract and simplify location
+    if _gemini_geocode_slots.acquire(timeout=GEMINI_GEOCODE_TIMEOUT):
+        try:
+            result = _gemini_geocode(location_text)
+        finally:
+            _gemini_geocode_slots.release()
+        if result is not None:
+            return result
+    else:
+        print("Skipping Gemini-assisted geocoding: fallback slots busy")
+
     # If all else fails, provide helpful error message
     return {
         "status": "error",
@@ -307,6 +456,30 @@ def geocode_location(location_text: str) -> Dict:
 
 # ─── TOOL: 2) persist result ────────────────────────────────────────────
 
+def embed_descriptions(descriptions: List[str]) -> List[Optional[List[float]]]:
+    """
+    Embeds several descriptions with a single model call. Each entry is the vector
+    for the matching description, or None if it can't be computed.
+    """
+    model = get_embedding_model()
+    if model is None:
+        return [None] * len(descriptions)
+    try:
+        embedding_result = model.get_embeddings(descriptions)
+        return [getattr(embedding, 'values', None) for embedding in embedding_result]
+    except Exception as e:
+        print(f"Warning: Failed to embed descriptions: {e}")
+    return [None] * len(descriptions)
+
+
+def embed_description(description: str) -> Optional[List[float]]:
+    """
+    Returns the embedding vector for a description, or None if it can't be computed.
+    Independent of the location, so callers can run it alongside geocoding.
+    """
+    return embed_descriptions([description])[0]
+
+
 def register_found_item(
         description: str,
         contact_email: str,
@@ -317,14 +490,43 @@ def register_found_item(
     """
     Embeds the description and saves the found item to Vertex AI + Firestore.
     """
-    global _db
+    return save_found_item(
+        description, contact_email, address, latitude, longitude,
+        feature_vector=embed_description(description)
+    )
+
+
+# Matching Engine upserts run off the request path; the pool's threads are joined
+# at interpreter exit, so queued upserts still complete on shutdown.
+_upsert_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="vertex-upsert")
+
+
+def _upsert_embedding(item_id: str, feature_vector: List[float]) -> None:
     try:
-        # Generate a unique item ID first (before any operations)
-        item_id = f"found_{uuid.uuid4().hex[:8]}"
+        # Save to Vertex AI Matching Engine
+        get_matching_index().upsert_datapoints([{"datapoint_id": item_id, "feature_vector": feature_vector}])
+        print(f"Successfully saved embedding to Vertex AI: {item_id}")
+        # Lets the matcher stop scanning for this item outside the index
+        get_db().collection("found_items").document(item_id).update({"indexed": True})
+    except Exception as e:
+        # Don't fail the registration if embedding fails
+        print(f"Warning: Failed to save to Matching Engine: {e}")
+
 
-        # Initialize Firestore client if needed
-        if _db is None:
-            _db = firestore.Client(project=PROJECT_ID)
+def save_found_item(
+        description: str,
+        contact_email: str,
+        address: str,
+        latitude: float,
+        longitude: float,
+        feature_vector: Optional[List[float]],
+) -> Dict:
+    """
+    Saves the found item to Firestore and, when an embedding is given, to Vertex AI.
+    """
+    try:
+        # Generate a unique item ID first (before any operations)
+        item_id = f"found_{secrets.token_hex(4)}"
 
         # Save metadata to Firestore FIRST (most important step)
         doc_data = {
@@ -334,42 +536,31 @@ def register_found_item(
             "address": address,
             "lat": latitude,
             "lon": longitude,
-            "timestamp": dt.datetime.utcnow(),
-            "status": "active"
+            "timestamp": firestore.SERVER_TIMESTAMP,  # stamped by Firestore on commit
+            "status": "active",
+            "indexed": False  # set once the embedding is in the Matching Engine index
         }
 
         print(f"Attempting to save to Firestore: {item_id}")
-        _db.collection("found_items").document(item_id).set(doc_data)
+        get_db().collection("found_items").document(item_id).set(doc_data)
         print(f"Successfully saved to Firestore: {item_id}")
 
-        # Try to create embedding and save to Vertex AI (secondary step)
-        embedding_success = False
-        if _embed is not None:
-            try:
-                embedding_result = _embed.get_embeddings([description])
-                if embedding_result and hasattr(embedding_result[0], 'values'):
-                    vec = embedding_result[0].values
-
-                    # Save to Vertex AI Matching Engine
-                    index = aiplatform.MatchingEngineIndex(INDEX_ID)
-                    index.upsert_datapoints([{"datapoint_id": item_id, "feature_vector": vec}])
-                    embedding_success = True
-                    print(f"Successfully saved embedding to Vertex AI: {item_id}")
-            except Exception as e:
-                print(f"Warning: Failed to save to Matching Engine: {e}")
-                # Don't fail the entire operation if embedding fails
+        # Save the embedding to Vertex AI (secondary step) in the background: nothing
+        # on the request path reads the index, so the caller doesn't wait on it
+        embedding_queued = feature_vector is not None
+        if embedding_queued:
+            _upsert_pool.submit(_upsert_embedding, item_id, feature_vector)
 
         return {
             "status": "success",
             "item_id": item_id,
             "firestore_saved": True,
-            "embedding_saved": embedding_success,
+            "embedding_queued": embedding_queued,
             "message": f"Found item registered successfully with ID: {item_id}"
         }
 
     except Exception as exc:
-        print(f"Error in register_found_item: {exc}")
-        import traceback
+        print(f"Error in save_found_item: {exc}")
         traceback.print_exc()
         return {
             "status": "error",
@@ -377,6 +568,20 @@ def register_found_item(
         }
 
 
+def warm_up() -> None:
+    """
+    Loads the embedding model, Firestore client and Matching Engine handle, and
+    sends one request through the first two, so the first registration after a
+    restart doesn't pay for model loading and channel setup.
+    """
+    embed_descriptions(["warmup"])
+    try:
+        get_db().collection("found_items").limit(1).get()
+        get_matching_index()
+    except Exception as e:
+        print(f"Warning: Warm-up failed: {e}")
+
+
 # ─── Helper function to check available models ─────────────────────────────
 
 def check_available_models():
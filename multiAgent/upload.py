@@ -1,6 +1,7 @@
 # upload_handbags.py
 
 import os
+import sys
 import datetime
 from dotenv import load_dotenv
 from google.cloud import firestore
@@ -50,25 +51,49 @@ items = [
     # …add as many variations as you need…
 ]
 
+# Firestore accepts at most 500 writes per batch commit
+MAX_BATCH_WRITES = 500
+
 def upload_items(batch):
-    for item in batch:
-        doc_ref = db.collection("found_items").document(item["id"])
-        # Prepare Firestore‐friendly dict
-        payload = {
-            "id":          item["id"],
-            "description": item["description"],
-            "address":     item["address"],
-            "lat":         item["lat"],
-            "lon":         item["lon"],
-            "email":       item["email"],
-            "status":      item["status"],
-            "timestamp":   item["timestamp"],
-        }
-        print(f"Uploading {item['id']}…", end=" ")
-        doc_ref.set(payload)
+    # One commit per chunk of documents instead of one round trip per document
+    for start in range(0, len(batch), MAX_BATCH_WRITES):
+        chunk = batch[start:start + MAX_BATCH_WRITES]
+        write_batch = db.batch()
+        for item in chunk:
+            doc_ref = db.collection("found_items").document(item["id"])
+            # Prepare Firestore‐friendly dict
+            payload = {
+                "id":          item["id"],
+                "description": item["description"],
+                "address":     item["address"],
+                "lat":         item["lat"],
+                "lon":         item["lon"],
+                "email":       item["email"],
+                "status":      item["status"],
+                "timestamp":   item["timestamp"],
+                "indexed":     False,  # seeded items have no Vector Search embedding
+            }
+            write_batch.set(doc_ref, payload)
+        print(f"Uploading {', '.join(item['id'] for item in chunk)}…", end=" ")
+        write_batch.commit()
         print("✅ done")
 
+def backfill_indexed_flag():
+    # Documents written before the "indexed" field existed: mark them as not indexed
+    # so the matcher keeps finding them next to its Vector Search shortlist
+    docs = [doc for doc in db.collection("found_items").stream() if "indexed" not in doc.to_dict()]
+    for start in range(0, len(docs), MAX_BATCH_WRITES):
+        write_batch = db.batch()
+        for doc in docs[start:start + MAX_BATCH_WRITES]:
+            write_batch.update(doc.reference, {"indexed": False})
+        write_batch.commit()
+    print(f"Marked {len(docs)} items as not indexed.")
+
 if __name__ == "__main__":
-    print("=== Batch Uploading Handbags to Firestore ===")
-    upload_items(items)
-    print("All items uploaded.")
+    if "--backfill-indexed" in sys.argv:
+        print("=== Backfilling the indexed flag on found_items ===")
+        backfill_indexed_flag()
+    else:
+        print("=== Batch Uploading Handbags to Firestore ===")
+        upload_items(items)
+        print("All items uploaded.")
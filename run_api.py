@@ -12,6 +12,7 @@ import argparse
 def main():
     parser = argparse.ArgumentParser(description='Run ItemRadar API Server')
     parser.add_argument('--port', type=int, default=8000, help='Port to run the server on')
+    parser.add_argument('--workers', type=int, help='Number of worker processes (defaults to api/main.py behaviour)')
     args = parser.parse_args()
     
     # Get the current directory
@@ -32,6 +33,8 @@ def main():
     
     # Run the main.py script with the specified port
     cmd = [sys.executable, 'main.py', '--port', str(args.port)]
+    if args.workers:
+        cmd += ['--workers', str(args.workers)]
     
     print(f"🚀 Starting ItemRadar API server on port {args.port}...")
     print(f"📁 Working directory: {api_dir}")
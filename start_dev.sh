@@ -19,7 +19,7 @@ fi
 # Install Python dependencies if requirements.txt exists
 if [ -f "requirements.txt" ]; then
     echo "📦 Installing Python dependencies..."
-    pip3 install -r requirements.txt
+    pip3 install -e .
 fi
 
 # Install frontend dependencies if package.json exists
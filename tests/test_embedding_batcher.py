@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from api.embedding_batcher import EmbeddingBatcher
+
+
+def test_concurrent_submits_share_one_call():
+    calls = []
+
+    def embed_many(texts):
+        calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    async def scenario():
+        batcher = EmbeddingBatcher(embed_many, flush_delay=0.01)
+        return await asyncio.gather(*(batcher.submit(text) for text in ("a", "bb", "ccc")))
+
+    assert asyncio.run(scenario()) == [[1.0], [2.0], [3.0]]
+    assert calls == [["a", "bb", "ccc"]]
+
+
+def test_full_batch_flushes_without_waiting():
+    calls = []
+
+    def embed_many(texts):
+        calls.append(list(texts))
+        return [[0.0] for _ in texts]
+
+    async def scenario():
+        # A flush delay far longer than the test: only max_batch can trigger the calls
+        batcher = EmbeddingBatcher(embed_many, max_batch=2, flush_delay=60)
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(str(i)) for i in range(4))), timeout=5
+        )
+
+    assert len(asyncio.run(scenario())) == 4
+    assert calls == [["0", "1"], ["2", "3"]]
+
+
+def test_missing_vectors_fail_every_caller():
+    def embed_many(texts):
+        return [[0.0]] * (len(texts) - 1)
+
+    async def scenario():
+        batcher = EmbeddingBatcher(embed_many, flush_delay=0.01)
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(t) for t in ("a", "b")), return_exceptions=True), timeout=5
+        )
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_embed_errors_propagate():
+    def embed_many(texts):
+        raise ValueError("quota exceeded")
+
+    async def scenario():
+        batcher = EmbeddingBatcher(embed_many, flush_delay=0.01)
+        await batcher.submit("a")
+
+    with pytest.raises(ValueError, match="quota exceeded"):
+        asyncio.run(scenario())
@@ -0,0 +1,147 @@
+import asyncio
+import time
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("google.adk")
+
+from google.adk.events import Event
+from google.adk.sessions.base_session_service import GetSessionConfig
+from google.genai import types
+
+from api.session_store import RedisSessionService
+
+APP = "ItemRadar"
+USER = "user-1"
+
+
+def make_service(**kwargs) -> RedisSessionService:
+    return RedisSessionService(fakeredis.FakeAsyncRedis(), **kwargs)
+
+
+def text_event(text: str, timestamp: float) -> Event:
+    return Event(
+        author="user",
+        content=types.Content(role="user", parts=[types.Part(text=text)]),
+        timestamp=timestamp,
+    )
+
+
+def test_events_round_trip():
+    async def scenario():
+        service = make_service()
+        session = await service.create_session(app_name=APP, user_id=USER, session_id="s1")
+        first = await service.append_event(session, text_event("hello", 1.0))
+        second = await service.append_event(session, text_event("world", 2.0))
+
+        loaded = await service.get_session(app_name=APP, user_id=USER, session_id="s1")
+        assert [e.id for e in loaded.events] == [first.id, second.id]
+        assert loaded.events[0].content == first.content
+        assert loaded.events[1].timestamp == 2.0
+
+    asyncio.run(scenario())
+
+
+def test_inline_image_is_not_persisted():
+    async def scenario():
+        service = make_service()
+        session = await service.create_session(app_name=APP, user_id=USER, session_id="s1")
+        event = Event(
+            author="user",
+            content=types.Content(role="user", parts=[
+                types.Part(text="found this"),
+                types.Part(inline_data=types.Blob(mime_type="image/png", data=b"\x89PNG" * 1000)),
+            ]),
+            timestamp=time.time(),
+        )
+        await service.append_event(session, event)
+
+        # The in-memory session used by the current turn keeps the image
+        assert session.events[-1].content.parts[1].inline_data.data.startswith(b"\x89PNG")
+
+        loaded = await service.get_session(app_name=APP, user_id=USER, session_id="s1")
+        parts = loaded.events[0].content.parts
+        assert parts[0].text == "found this"
+        assert parts[1].inline_data is None
+        assert parts[1].text == "[image/png attachment omitted]"
+
+    asyncio.run(scenario())
+
+
+def test_get_session_config_filters():
+    async def scenario():
+        service = make_service()
+        session = await service.create_session(app_name=APP, user_id=USER, session_id="s1")
+        for i in range(5):
+            await service.append_event(session, text_event(f"m{i}", float(i)))
+
+        recent = await service.get_session(
+            app_name=APP, user_id=USER, session_id="s1", config=GetSessionConfig(num_recent_events=2)
+        )
+        assert [e.content.parts[0].text for e in recent.events] == ["m3", "m4"]
+
+        after = await service.get_session(
+            app_name=APP, user_id=USER, session_id="s1", config=GetSessionConfig(after_timestamp=3.0)
+        )
+        assert [e.content.parts[0].text for e in after.events] == ["m3", "m4"]
+
+    asyncio.run(scenario())
+
+
+def test_events_are_capped():
+    async def scenario():
+        service = make_service(max_events=3)
+        session = await service.create_session(app_name=APP, user_id=USER, session_id="s1")
+        for i in range(5):
+            await service.append_event(session, text_event(f"m{i}", float(i)))
+
+        loaded = await service.get_session(app_name=APP, user_id=USER, session_id="s1")
+        assert [e.content.parts[0].text for e in loaded.events] == ["m2", "m3", "m4"]
+
+    asyncio.run(scenario())
+
+
+def test_partial_events_are_not_persisted():
+    async def scenario():
+        service = make_service()
+        session = await service.create_session(app_name=APP, user_id=USER, session_id="s1")
+        partial = text_event("typing", 1.0)
+        partial.partial = True
+        await service.append_event(session, partial)
+
+        loaded = await service.get_session(app_name=APP, user_id=USER, session_id="s1")
+        assert loaded.events == []
+
+    asyncio.run(scenario())
+
+
+def test_create_session_if_missing_is_nx():
+    async def scenario():
+        service = make_service()
+        assert await service.create_session_if_missing(app_name=APP, user_id=USER, session_id="s1")
+
+        session = await service.get_session(app_name=APP, user_id=USER, session_id="s1")
+        await service.append_event(session, text_event("kept", 1.0))
+
+        # An existing session (and its events) is left untouched
+        assert not await service.create_session_if_missing(app_name=APP, user_id=USER, session_id="s1")
+        loaded = await service.get_session(app_name=APP, user_id=USER, session_id="s1")
+        assert [e.content.parts[0].text for e in loaded.events] == ["kept"]
+
+        listed = await service.list_sessions(app_name=APP, user_id=USER)
+        assert [s.id for s in listed.sessions] == ["s1"]
+
+    asyncio.run(scenario())
+
+
+def test_delete_session():
+    async def scenario():
+        service = make_service()
+        await service.create_session(app_name=APP, user_id=USER, session_id="s1")
+        await service.delete_session(app_name=APP, user_id=USER, session_id="s1")
+
+        assert await service.get_session(app_name=APP, user_id=USER, session_id="s1") is None
+        assert (await service.list_sessions(app_name=APP, user_id=USER)).sessions == []
+
+    asyncio.run(scenario())